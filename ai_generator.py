@@ -3,13 +3,235 @@ AI Ad Generation Module using Replicate API
 Supports FLUX models for generating professional advertisements
 """
 
+import base64
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import shutil
+import sys
+import threading
+import httpx
 import replicate
 from PIL import Image
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
 from io import BytesIO
-from typing import Optional
+from pathlib import Path
+from types import MappingProxyType
+from typing import Dict, List, Literal, Optional, Tuple
 import time
 
+# ========== HTTP SESSION ==========
+# Shared keep-alive session so image downloads reuse pooled connections
+# instead of paying a fresh TCP + TLS handshake per generation
+_SESSION = requests.Session()
+# Transient download/validation failures are retried here with backoff and
+# Retry-After honoured. Only idempotent GETs go through this session.
+_RETRY = Retry(
+    total=3,
+    backoff_factor=0.5,
+    status_forcelist=[429, 500, 502, 503, 504],
+    allowed_methods=["GET", "HEAD"],
+    respect_retry_after_header=True
+)
+_SESSION.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=_RETRY))
+
+def _backoff_delay(attempt: int, base: float = 1.0) -> float:
+    """Jittered exponential delay so concurrent retries don't land together"""
+    return min(30.0, random.uniform(0.5 * base, base * 2 ** attempt))
+
+@lru_cache(maxsize=8)
+def _get_client(api_key: str) -> replicate.Client:
+    """Replicate client per API key, reused so its connection pool outlives each call"""
+    # Keep-alive pool sized for concurrent batch generation
+    return replicate.Client(
+        api_token=api_key,
+        limits=httpx.Limits(max_connections=16, max_keepalive_connections=16)
+    )
+
+# ========== GENERATION CACHE ==========
+# Exact-match cache of downloaded outputs, keyed by model + full input params
+GENERATION_CACHE_DIR = Path("ad_cache") / "generations"
+GENERATION_CACHE_MAX_FILES = 500
+GENERATION_CACHE_TTL_SECONDS = 7 * 24 * 3600  # Entries unused this long are dropped
+
+def _generation_cache_path(model_id: str, input_params: Dict) -> Path:
+    """On-disk location for the output of this exact model + inputs"""
+    payload = json.dumps({**input_params, "model_id": model_id}, sort_keys=True)
+    key = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return GENERATION_CACHE_DIR / f"{key}.{input_params['output_format']}"
+
+def _load_cached_generation(path: Path) -> Optional[Image.Image]:
+    """Cached image for a previous identical request, or None"""
+    try:
+        if time.time() - path.stat().st_mtime > GENERATION_CACHE_TTL_SECONDS:
+            path.unlink()
+            return None
+        image = Image.open(path)
+        image.load()
+        image.info["from_cache"] = True  # Lets callers without a placeholder report the hit
+        os.utime(path)  # Mark as recently used for eviction
+        return image
+    except Exception:
+        return None
+
+def _evict_generations() -> None:
+    """Drop expired cache files, then least recently used ones past the cap"""
+    try:
+        cached = sorted(GENERATION_CACHE_DIR.iterdir(), key=lambda p: p.stat().st_mtime)
+        cutoff = time.time() - GENERATION_CACHE_TTL_SECONDS
+        expired = sum(1 for p in cached if p.stat().st_mtime < cutoff)
+        for old in cached[:max(expired, len(cached) - GENERATION_CACHE_MAX_FILES)]:
+            old.unlink()
+    except OSError:
+        pass  # Caching is best-effort; never fail a generation over it
+
+# Outputs are already-compressed images; skip transfer-encoding so the raw
+# stream can be handed to PIL (or the cache file) as it arrives
+_DOWNLOAD_HEADERS = {"Accept-Encoding": "identity"}
+
+# Shared pool for downloading/decoding several outputs of one prediction at once
+_IO_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="ad-download")
+
+def _download_image(image_url: str, save_to: Optional[Path] = None) -> Image.Image:
+    """
+    Stream a generated image into PIL without buffering the whole body first
+
+    When save_to is given the stream is written to that cache file and decoded
+    from there, so the bytes are only held once.
+    """
+    if save_to is not None:
+        try:
+            save_to.parent.mkdir(parents=True, exist_ok=True)
+        except OSError:
+            save_to = None
+
+    with _SESSION.get(image_url, timeout=30, stream=True, headers=_DOWNLOAD_HEADERS) as response:
+        response.raise_for_status()
+        response.raw.decode_content = True
+
+        if save_to is None:
+            image = Image.open(response.raw)
+            image.load()
+            return image
+
+        # Write under a temp name so a partial download is never a cache hit
+        partial = save_to.with_suffix(save_to.suffix + ".part")
+        with open(partial, "wb") as f:
+            shutil.copyfileobj(response.raw, f, 1024 * 1024)
+        os.replace(partial, save_to)
+
+    image = Image.open(save_to)
+    image.load()
+    _evict_generations()
+    return image
+
+class SemanticCache:
+    """
+    Finds an earlier generation whose prompt nearly matches a new one
+
+    Prompts are compared by cosine similarity of their word counts, which is
+    enough for the ad prompts here (long templates where a few words change
+    between iterations) without pulling in an embedding model.
+    """
+
+    def __init__(self, threshold: float = 0.9, max_entries: int = 200):
+        self.threshold = threshold
+        self._entries = deque(maxlen=max_entries)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _vector(prompt: str):
+        counts = Counter(re.findall(r"[a-z0-9]+", prompt.lower()))
+        norm = math.sqrt(sum(c * c for c in counts.values()))
+        return counts, norm
+
+    def add(self, scope, prompt: str, path: Path) -> None:
+        """Remember the output stored at path for this prompt within scope"""
+        counts, norm = self._vector(prompt)
+        if norm:
+            with self._lock:
+                self._entries.append((scope, counts, norm, path))
+
+    def lookup(self, scope, prompt: str) -> Optional[Path]:
+        """Path of the most similar earlier output above threshold, or None"""
+        counts, norm = self._vector(prompt)
+        if not norm:
+            return None
+        best_path, best_score = None, self.threshold
+        with self._lock:
+            entries = list(self._entries)
+        for entry_scope, entry_counts, entry_norm, path in entries:
+            if entry_scope != scope:
+                continue
+            dot = sum(c * entry_counts[w] for w, c in counts.items() if w in entry_counts)
+            score = dot / (norm * entry_norm)
+            if score >= best_score and path.exists():
+                best_path, best_score = path, score
+        return best_path
+
+_SEMANTIC_CACHE = SemanticCache()
+
+# Models that accept an init image for a short img2img warm start
+IMG2IMG_MODELS = {"flux-dev"}
+WARM_START_PROMPT_STRENGTH = 0.3  # ~8 of 28 denoising steps actually run
+
+# Images sent to the API are capped to this edge and sent as JPEG
+UPLOAD_MAX_EDGE = 1536
+UPLOAD_JPEG_QUALITY = 88
+
+
+def _image_data_uri(path: Path) -> str:
+    """Compact data URI for an image input; lossy sources under the size cap go as-is"""
+    if path.suffix in (".jpg", ".jpeg", ".webp"):
+        with Image.open(path) as img:
+            fits = max(img.size) <= UPLOAD_MAX_EDGE
+        if fits:
+            encoded = base64.b64encode(path.read_bytes()).decode("ascii")
+            return f"data:image/{path.suffix[1:]};base64,{encoded}"
+
+    with Image.open(path) as img:
+        img = img.convert("RGB")
+        img.thumbnail((UPLOAD_MAX_EDGE, UPLOAD_MAX_EDGE), Image.Resampling.LANCZOS)
+        with BytesIO() as buf:
+            img.save(buf, format="JPEG", quality=UPLOAD_JPEG_QUALITY, optimize=True, progressive=True)
+            encoded = base64.b64encode(buf.getbuffer()).decode("ascii")
+    return f"data:image/jpeg;base64,{encoded}"
+
+
+# Requests currently being generated, so identical concurrent calls share one run
+_INFLIGHT: Dict[str, Future] = {}
+_INFLIGHT_LOCK = threading.Lock()
+
+# Models that follow a negative prompt appended to the main prompt; the
+# rest have no negative input and the text is dropped
+NEGATIVE_PROMPT_MODELS = frozenset({"flux-dev", "flux-schnell"})
+
+# Model + step count used for quick draft renders
+PREVIEW_MODEL_KEY = "flux-schnell"
+PREVIEW_INFERENCE_STEPS = 4
+
+# Models that return several images from one prediction via num_outputs
+MULTI_OUTPUT_MODELS = frozenset({"flux-dev", "flux-schnell"})
+MAX_OUTPUTS_PER_REQUEST = 4
+
+# (output_format, output_quality) per model; only the FLUX models offer WebP,
+# everything else is asked for the lossless PNG they all accept
+MODEL_OUTPUT_FORMATS = MappingProxyType({
+    "flux-1.1-pro": ("webp", 90),
+    "flux-pro": ("webp", 90),
+    "flux-dev": ("webp", 90),
+    "flux-schnell": ("webp", 90),
+})
+DEFAULT_OUTPUT_FORMAT = ("png", 100)
+
 # ========== AI MODELS CONFIGURATION ==========
 AI_MODELS = {
     # Google Imagen Models
@@ -91,68 +313,24 @@ AD_STYLE_CATEGORIES = {
     "Professional Corporate": "Professional business aesthetic, corporate styling, clean and formal"
 }
 
-def generate_ad_with_replicate(
-    prompt: str,
-    negative_prompt: str,
-    api_key: str,
-    model_key: str = "imagen-4",
-    aspect_ratio: str = "1:1",
-    product_image: Optional[Image.Image] = None,
-    logo_image: Optional[Image.Image] = None,
-    progress_placeholder=None,
-    num_inference_steps: int = 28,
-    guidance_scale: float = 3.5,
-    safety_tolerance: int = 2,
-    max_retries: int = 3
-) -> Optional[Image.Image]:
-    """
-    Generate advertisement image using Replicate API with FLUX models
-
-    Args:
-        prompt: Text prompt describing the desired image
-        negative_prompt: Things to avoid in generation
-        api_key: Replicate API key
-        model_key: Key from AI_MODELS dict (default: "flux-1.1-pro")
-        aspect_ratio: Image aspect ratio (e.g., "1:1", "16:9", "9:16")
-        product_image: Optional product image for reference
-        logo_image: Optional logo image (not used in generation, added post-process)
-        progress_placeholder: Streamlit placeholder for progress updates
-        num_inference_steps: Number of denoising steps (higher = better quality, slower)
-        guidance_scale: How closely to follow prompt (3-15 recommended)
-        safety_tolerance: Content moderation level (1-6, higher = more lenient)
-        max_retries: Maximum number of retry attempts
-
-    Returns:
-        PIL Image object or None if generation fails
-    """
-
-    # Validate API key
-    if not api_key or api_key.strip() == "":
-        if progress_placeholder:
-            progress_placeholder.error("❌ API key is required")
-        return None
-
-    # Get model configuration
-    model_config = AI_MODELS.get(model_key, AI_MODELS["imagen-4"])
+# Read-only interned view, built once at import
+AD_STYLE_CATEGORIES = MappingProxyType(
+    {sys.intern(k): sys.intern(v) for k, v in AD_STYLE_CATEGORIES.items()}
+)
+AD_STYLE_NAMES = tuple(AD_STYLE_CATEGORIES)
+
+def _run_prediction(
+    client: replicate.Client,
+    model_config: Dict,
+    input_params: Dict,
+    progress_placeholder,
+    max_retries: int,
+    save_to: Optional[Path],
+    num_outputs: int = 1
+) -> Optional[List[Image.Image]]:
+    """Run one prediction with retries and download its output(s)"""
     model_id = model_config["model_id"]
-
-    # Set API key for replicate
-    client = replicate.Client(api_token=api_key)
-
-    # Prepare input parameters
-    input_params = {
-        "prompt": prompt,
-        "aspect_ratio": aspect_ratio,
-        "num_inference_steps": num_inference_steps,
-        "guidance_scale": guidance_scale,
-        "output_format": "png",
-        "output_quality": 100,
-        "safety_tolerance": safety_tolerance
-    }
-
-    # Add negative prompt if provided and model supports it
-    if negative_prompt and model_key in ["flux-dev", "flux-schnell"]:
-        input_params["prompt"] = f"{prompt}\n\nNegative: {negative_prompt}"
+    safety_tolerance = input_params["safety_tolerance"]
 
     # Attempt generation with retries
     for attempt in range(max_retries):
@@ -160,34 +338,37 @@ def generate_ad_with_replicate(
             if progress_placeholder:
                 progress_placeholder.info(f"🎨 Generating with {model_config['name']}... (Attempt {attempt + 1}/{max_retries})")
 
-            # Run the model
+            # Run the model; plain URLs rather than FileOutput objects, so the
+            # download below can stream straight into the cache file
             output = client.run(
                 model_id,
-                input=input_params
+                input=input_params,
+                use_file_output=False
             )
 
             # Handle different output formats
             if isinstance(output, list) and len(output) > 0:
-                image_url = output[0]
+                image_urls = output[:num_outputs]
             elif isinstance(output, str):
-                image_url = output
+                image_urls = [output]
             else:
                 raise ValueError(f"Unexpected output format: {type(output)}")
 
-            # Download the generated image
+            # Download the generated image(s)
             if progress_placeholder:
                 progress_placeholder.info("📥 Downloading generated image...")
 
-            response = requests.get(image_url, timeout=30)
-            response.raise_for_status()
-
-            # Convert to PIL Image
-            image = Image.open(BytesIO(response.content))
+            if len(image_urls) == 1:
+                images = [_download_image(image_urls[0], save_to=save_to)]
+            else:
+                # Variants download + decode side by side rather than one after another
+                futures = [_IO_POOL.submit(_download_image, url) for url in image_urls]
+                images = [f.result() for f in futures]
 
             if progress_placeholder:
                 progress_placeholder.success("✅ Image generated successfully!")
 
-            return image
+            return images
 
         except replicate.exceptions.ReplicateError as e:
             error_msg = str(e)
@@ -197,7 +378,7 @@ def generate_ad_with_replicate(
                     progress_placeholder.warning(f"⚠️ Content filter triggered. Adjusting safety settings...")
                 # Retry with higher safety tolerance
                 input_params["safety_tolerance"] = min(safety_tolerance + 1, 6)
-                time.sleep(2)
+                time.sleep(_backoff_delay(attempt))
                 continue
 
             elif "billing" in error_msg.lower() or "credit" in error_msg.lower():
@@ -208,14 +389,14 @@ def generate_ad_with_replicate(
             elif "rate limit" in error_msg.lower():
                 if progress_placeholder:
                     progress_placeholder.warning(f"⚠️ Rate limit hit. Waiting before retry...")
-                time.sleep(5 * (attempt + 1))  # Exponential backoff
+                time.sleep(_backoff_delay(attempt, base=5.0))
                 continue
 
             else:
                 if attempt < max_retries - 1:
                     if progress_placeholder:
                         progress_placeholder.warning(f"⚠️ Error: {error_msg}. Retrying...")
-                    time.sleep(2)
+                    time.sleep(_backoff_delay(attempt))
                     continue
                 else:
                     if progress_placeholder:
@@ -226,7 +407,7 @@ def generate_ad_with_replicate(
             if attempt < max_retries - 1:
                 if progress_placeholder:
                     progress_placeholder.warning(f"⚠️ Network error. Retrying...")
-                time.sleep(2)
+                time.sleep(_backoff_delay(attempt))
                 continue
             else:
                 if progress_placeholder:
@@ -237,7 +418,7 @@ def generate_ad_with_replicate(
             if attempt < max_retries - 1:
                 if progress_placeholder:
                     progress_placeholder.warning(f"⚠️ Unexpected error. Retrying...")
-                time.sleep(2)
+                time.sleep(_backoff_delay(attempt))
                 continue
             else:
                 if progress_placeholder:
@@ -250,6 +431,250 @@ def generate_ad_with_replicate(
     return None
 
 
+
+def _prepare_request(
+    prompt: str,
+    negative_prompt: str,
+    model_key: str,
+    aspect_ratio: str,
+    mode: str,
+    num_inference_steps: int,
+    guidance_scale: float,
+    safety_tolerance: int,
+    output_format: Optional[str],
+    output_quality: Optional[int]
+) -> Tuple[str, Dict, Dict]:
+    """Resolve the model for this mode and build its input parameters
+
+    Returns:
+        (effective model_key, model config, input_params)
+    """
+    # Drafts don't need the selected model's quality
+    if mode == "preview":
+        model_key = PREVIEW_MODEL_KEY
+        num_inference_steps = PREVIEW_INFERENCE_STEPS
+
+    # Get model configuration
+    model_config = AI_MODELS.get(model_key, AI_MODELS["imagen-4"])
+    default_format, default_quality = MODEL_OUTPUT_FORMATS.get(model_key, DEFAULT_OUTPUT_FORMAT)
+
+    # Prepare input parameters
+    input_params = {
+        "prompt": prompt,
+        "aspect_ratio": aspect_ratio,
+        "num_inference_steps": num_inference_steps,
+        "guidance_scale": guidance_scale,
+        "output_format": output_format or default_format,
+        "output_quality": output_quality or default_quality,
+        "safety_tolerance": safety_tolerance
+    }
+
+    # Merge negative prompt once, before any retries, for models that honour it
+    if negative_prompt and model_key in NEGATIVE_PROMPT_MODELS:
+        input_params["prompt"] = f"{prompt}\n\nNegative: {negative_prompt}"
+
+    return model_key, model_config, input_params
+
+
+def generate_ad_with_replicate(
+    prompt: str,
+    negative_prompt: str,
+    api_key: str,
+    model_key: str = "imagen-4",
+    aspect_ratio: str = "1:1",
+    product_image: Optional[Image.Image] = None,
+    logo_image: Optional[Image.Image] = None,
+    progress_placeholder=None,
+    num_inference_steps: int = 28,
+    guidance_scale: float = 3.5,
+    safety_tolerance: int = 2,
+    max_retries: int = 3,
+    use_cache: bool = True,
+    reuse_similar: bool = False,
+    similarity_scope: tuple = (),
+    mode: Literal["preview", "final"] = "final",
+    output_format: Optional[str] = None,
+    output_quality: Optional[int] = None
+):
+    """
+    Generate advertisement image using Replicate API with FLUX models
+
+    Args:
+        prompt: Text prompt describing the desired image
+        negative_prompt: Things to avoid in generation
+        api_key: Replicate API key
+        model_key: Key from AI_MODELS dict (default: "flux-1.1-pro")
+        aspect_ratio: Image aspect ratio (e.g., "1:1", "16:9", "9:16")
+        product_image: Optional product image for reference (not uploaded; the
+            prompt describes the product, and the only image input sent is the
+            warm-start frame, capped at UPLOAD_MAX_EDGE as JPEG)
+        logo_image: Optional logo image (not used in generation, added post-process)
+        progress_placeholder: Streamlit placeholder for progress updates
+        num_inference_steps: Number of denoising steps (higher = better quality, slower)
+        guidance_scale: How closely to follow prompt (3-15 recommended)
+        safety_tolerance: Content moderation level (1-6, higher = more lenient)
+        max_retries: Maximum number of retry attempts
+        use_cache: Return the stored result of an identical earlier request
+            instead of running the model again (disable to force a fresh variant);
+            such images carry info["from_cache"] = True
+        reuse_similar: For img2img-capable models, warm-start from the output of a
+            near-identical earlier prompt so only the last few steps are denoised
+        similarity_scope: What must match exactly before prompts are compared
+            for a warm start, e.g. (brand, product, style, concept); the filled
+            templates are too alike across brands to tell apart by text alone,
+            so no warm start happens without one
+        mode: "preview" renders a quick draft with FLUX Schnell at 4 steps,
+            regardless of model_key; "final" uses the selected model
+        output_format: Override the model's format from MODEL_OUTPUT_FORMATS
+            (WebP for FLUX models, PNG otherwise); must be one the model accepts
+        output_quality: Override the encoder quality for lossy formats (1-100)
+
+    Returns:
+        PIL Image object or None if generation fails
+    """
+
+    # Validate API key
+    if not api_key or api_key.strip() == "":
+        if progress_placeholder:
+            progress_placeholder.error("❌ API key is required")
+        return None
+
+    model_key, model_config, input_params = _prepare_request(
+        prompt, negative_prompt, model_key, aspect_ratio, mode, num_inference_steps,
+        guidance_scale, safety_tolerance, output_format, output_quality
+    )
+    model_id = model_config["model_id"]
+
+    # Set API key for replicate
+    client = _get_client(api_key)
+
+    # Identical request already generated - skip the model entirely
+    cache_path = _generation_cache_path(model_id, input_params)
+    if use_cache:
+        cached_image = _load_cached_generation(cache_path)
+        if cached_image is not None:
+            if progress_placeholder:
+                progress_placeholder.success("✅ Loaded identical generation from cache")
+            return cached_image
+
+    # Near-duplicate prompt already generated - refine it instead of starting from noise
+    scope = (model_id, aspect_ratio, *similarity_scope)
+    if use_cache and reuse_similar and similarity_scope and model_key in IMG2IMG_MODELS:
+        similar_path = _SEMANTIC_CACHE.lookup(scope, prompt)
+        if similar_path is not None:
+            input_params["image"] = _image_data_uri(similar_path)
+            input_params["prompt_strength"] = WARM_START_PROMPT_STRENGTH
+            # Stored under its own key so plain text-to-image requests never get it
+            cache_path = _generation_cache_path(model_id, input_params)
+
+    cache_key = cache_path.stem
+
+    def _generate():
+        images = _run_prediction(
+            client, model_config, input_params, progress_placeholder,
+            max_retries, save_to=cache_path if use_cache else None
+        )
+        result = images[0] if images else None
+        # Only outputs of img2img-capable models can ever seed a warm start
+        if result is not None and use_cache and similarity_scope and model_key in IMG2IMG_MODELS:
+            _SEMANTIC_CACHE.add(scope, prompt, cache_path)
+        return result
+
+    if not use_cache:
+        return _generate()
+
+    # Identical request already running (double-click, another session) - wait for it
+    with _INFLIGHT_LOCK:
+        pending = _INFLIGHT.get(cache_key)
+        if pending is None:
+            future = Future()
+            _INFLIGHT[cache_key] = future
+
+    if pending is not None:
+        if progress_placeholder:
+            progress_placeholder.info("⏳ Identical generation already running, waiting for it...")
+        image = pending.result()
+        if image is not None and progress_placeholder:
+            progress_placeholder.success("✅ Image generated successfully!")
+        return image.copy() if image is not None else None
+
+    try:
+        image = _generate()
+        future.set_result(image)
+        return image
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _INFLIGHT_LOCK:
+            _INFLIGHT.pop(cache_key, None)
+
+
+def generate_ad_variants(
+    prompt: str,
+    negative_prompt: str,
+    api_key: str,
+    num_variants: int,
+    model_key: str = "imagen-4",
+    aspect_ratio: str = "1:1",
+    num_inference_steps: int = 28,
+    guidance_scale: float = 3.5,
+    safety_tolerance: int = 2,
+    max_retries: int = 3,
+    mode: Literal["preview", "final"] = "final",
+    output_format: Optional[str] = None,
+    output_quality: Optional[int] = None
+) -> List[Image.Image]:
+    """
+    Generate several fresh variants of one ad
+
+    Models in MULTI_OUTPUT_MODELS return up to MAX_OUTPUTS_PER_REQUEST images
+    from a single prediction; other models run one prediction per variant,
+    concurrently. Variants are never served from or written to the cache.
+
+    Args:
+        num_variants: Number of images wanted
+        Others: Same as generate_ad_with_replicate
+
+    Returns:
+        List of successfully generated PIL Images (may be shorter than requested)
+    """
+    if not api_key or api_key.strip() == "" or num_variants < 1:
+        return []
+
+    model_key, model_config, input_params = _prepare_request(
+        prompt, negative_prompt, model_key, aspect_ratio, mode, num_inference_steps,
+        guidance_scale, safety_tolerance, output_format, output_quality
+    )
+    client = _get_client(api_key)
+
+    def _predict(count: int) -> List[Image.Image]:
+        # Own params per prediction: retries adjust safety_tolerance in place
+        params = dict(input_params)
+        if count > 1:
+            params["num_outputs"] = count
+        return _run_prediction(client, model_config, params, None, max_retries, None, count) or []
+
+    if model_key in MULTI_OUTPUT_MODELS:
+        counts = [
+            min(MAX_OUTPUTS_PER_REQUEST, num_variants - start)
+            for start in range(0, num_variants, MAX_OUTPUTS_PER_REQUEST)
+        ]
+    else:
+        counts = [1] * num_variants
+
+    if len(counts) == 1:
+        return _predict(counts[0])
+
+    # Local pool: _IO_POOL is busy with the downloads these predictions wait on
+    with ThreadPoolExecutor(max_workers=len(counts)) as pool:
+        return [image for images in pool.map(_predict, counts) for image in images]
+
+
+VALIDATION_TTL_SECONDS = 600
+VALIDATION_CACHE_MAX_KEYS = 32
+_validated_keys: Dict[str, tuple] = {}  # sha256 of key -> (is_valid, checked_at)
+
 def validate_api_key(api_key: str) -> bool:
     """
     Validate Replicate API key by making a test request
@@ -263,11 +688,28 @@ def validate_api_key(api_key: str) -> bool:
     if not api_key or api_key.strip() == "":
         return False
 
+    # Reruns re-validate the same key constantly; reuse a recent answer
+    key_digest = hashlib.sha256(api_key.encode("utf-8", "surrogatepass")).hexdigest()
+    cached = _validated_keys.get(key_digest)
+    if cached is not None and time.monotonic() - cached[1] < VALIDATION_TTL_SECONDS:
+        return cached[0]
+
     try:
-        client = replicate.Client(api_token=api_key)
-        # Try to list models as a validation check
-        # This is a lightweight operation
-        list(client.models.list())
-        return True
-    except:
-        return False
+        # Single account lookup through the same client generation uses, so
+        # the TLS connection opened here is already warm for the first ad
+        _get_client(api_key).accounts.current()
+        is_valid = True
+    except replicate.exceptions.ReplicateError as e:
+        if e.status not in (401, 403):
+            return False  # Server-side trouble says nothing about the key; don't cache
+        is_valid = False
+    except httpx.HTTPError:
+        return False  # Network trouble says nothing about the key; don't cache
+    except Exception:
+        return False  # e.g. a pasted non-ASCII character in the header; don't cache
+
+    # Oldest answer goes first once the cap is reached
+    if key_digest not in _validated_keys and len(_validated_keys) >= VALIDATION_CACHE_MAX_KEYS:
+        _validated_keys.pop(next(iter(_validated_keys)))
+    _validated_keys[key_digest] = (is_valid, time.monotonic())
+    return is_valid
@@ -4,27 +4,75 @@ Enhanced with confidence scoring, source tracking, and comprehensive brand intel
 """
 
 import streamlit as st
+from streamlit.errors import StreamlitAPIException
+import io
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from functools import lru_cache
+import hashlib
 import json
+import logging
 import re
-import requests
 import os
+import tempfile
+import time
+import uuid
+import zipfile
+import numpy as np
 from PIL import Image
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+try:
+    import xxhash  # Optional: much faster than hashlib for cache keys on large uploads
+except ImportError:
+    xxhash = None
 
 # Import our modules
 from utils import (
+    AD_CACHE_DIR, VIDEO_CACHE_DIR, VIDEO_CACHE_MAX_FILES, VIDEO_CACHE_TTL_SECONDS,
+    evict_cache_dir, brand_cache_path,
     save_brand_to_cache, load_brand_from_cache, list_cached_brands, delete_brand_cache,
-    save_ad_to_cache, load_ad_from_cache, list_cached_ads, delete_ad_cache,
-    safe_open_image, download_image_from_url, enhance_product_image,
-    create_collection_collage, truncate_to_limit, remove_background
+    save_ad_to_cache_async, load_ad_from_cache, list_cached_ads, delete_ad_cache,
+    safe_open_image, download_image_from_url, prefetch_images, fetch_many_bytes, enhance_product_image,
+    create_collection_collage, truncate_to_limit, remove_background, smart_resize
 )
 from crawler_fallback import run_crawl_with_fallback
+from google_sync import (  # stdlib-only at import; Google libs load lazily
+    SHEET_ID_PATTERN, get_worksheets_and_headers
+)
 from brand_extractor import create_brand_data_structure
 from ai_generator import (
     generate_ad_with_replicate,
+    generate_ad_variants,
     AI_MODELS,
-    AD_STYLE_CATEGORIES
+    AD_STYLE_CATEGORIES,
+    AD_STYLE_NAMES,
+    IMG2IMG_MODELS,
+    MAX_OUTPUTS_PER_REQUEST,
+    MULTI_OUTPUT_MODELS,
+    NEGATIVE_PROMPT_MODELS,
+    PREVIEW_MODEL_KEY
 )
 
+# Enhanced generator is optional; imported once per process, not per rerun
+try:
+    from ad_generator_enhanced import (
+        ENHANCED_STYLE_THEMES,
+        AD_CONCEPTS,
+        generate_positive_prompt_elements,
+        generate_negative_prompt_elements,
+        combine_multiple_images_layout,
+        add_logos_with_smart_positioning
+    )
+    AD_CONCEPT_NAMES = tuple(AD_CONCEPTS)
+    ENHANCED_AVAILABLE = True
+except ImportError:
+    ENHANCED_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
 # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 # PAGE CONFIGURATION
 # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
@@ -40,7 +88,10 @@ st.set_page_config(
 # STYLING
 # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 
-st.markdown("""
+@st.cache_resource
+def _css_blob() -> str:
+    """Page stylesheet, built once per process rather than on every rerun"""
+    return """
 <style>
     .main {background: linear-gradient(180deg, #0a0a0a 0%, #1a1a2e 100%); min-height: 100vh;}
     h1, h2, h3, p, label {color: white; font-family: 'Helvetica Neue', Arial, sans-serif;}
@@ -91,7 +142,7 @@ st.markdown("""
         background: rgba(102, 126, 234, 0.1);
     }
 </style>
-""", unsafe_allow_html=True)
+"""
 
 # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 # CONSTANTS
@@ -101,12 +152,336 @@ DEFAULT_NEGATIVE_PROMPT = """blurry, distorted, warped, unclear, pixelated, low
 ugly, deformed, bad proportions, watermark, amateur, unprofessional, poor lighting,
 white borders, borders around image, picture frame, white space around edges"""
 
+# Final prompt layouts, filled with str.format_map
+BRAND_PROMPT_TEMPLATE = """Professional advertising photograph.
+
+BRAND: {brand_name} - {market_pos} {category}
+
+STYLE: {style_desc}
+
+CONCEPT: {concept_desc}
+{ad_content_section}
+POSITIVE ELEMENTS (DO):
+{positive_prompt}
+
+COMPOSITION GUIDELINES:
+- Product clearly visible and prominent
+- Professional commercial photography quality
+- Clean, uncluttered composition
+- Reserve top area for logos (will be added after generation)
+- High quality 8K details, crystal clear focus
+"""
+
+BASIC_PROMPT_TEMPLATE = """Professional advertising photograph.
+
+STYLE: {style}
+
+POSITIVE ELEMENTS (DO):
+{positive_prompt}
+
+High quality, professional, 8K resolution, crystal clear details.
+"""
+
+# Concurrent Replicate predictions in batch mode
+BATCH_GENERATION_WORKERS = 8
+
+# Uploads are downscaled to this longest edge once, at decode time
+MAX_UPLOAD_EDGE = 2048
+
+# Encoders for generated ads: extension, mime type, save() options.
+# PNG at compress_level=1 trades a little size for a much faster encode.
+RESULT_FORMATS = {
+    "PNG": ("png", "image/png", {"compress_level": 1}),
+    "WEBP": ("webp", "image/webp", {"lossless": True, "quality": 90, "method": 4}),
+}
+
+# Auto-Sync "create new column" rows: widget key suffix, default header, data field
+NEW_COLUMN_SPEC = (
+    ("product", "Product Name", "product_name"),
+    ("size", "Ad Size", "size"),
+    ("generated", "Generated At", "generated_at"),
+    ("status", "Status", "status"),
+    ("url", "Ad URL", "drive_link"),
+)
+
+# Existing sheet header -> default data field, first keyword hit wins
+HEADER_AUTO_MATCH = (
+    (("product", "name"), "Product Name"),
+    (("size", "dimension"), "Ad Size"),
+    (("generate", "date", "time"), "Generated At"),
+    (("status",), "Status"),
+    (("url", "link", "drive"), "Ad URL"),
+)
+
+# Size label -> filename part, e.g. "Story (9:16)" -> "Story_9:16"
+SIZE_SLUG_TABLE = str.maketrans({" ": "_", "(": "", ")": ""})
+
+# Selectbox options built once rather than on every rerun
+AI_MODEL_KEYS = tuple(AI_MODELS)
+AI_MODEL_NAMES = tuple(model['name'] for model in AI_MODELS.values())
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# CACHED LOOKUPS
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+# Every widget click reruns the script; keep the sidebar's cache-directory
+# reads in memory. Listings expire after a minute (and are cleared when this
+# app writes/deletes); single entries are keyed on file mtime so edits show up.
+
+def _mtime(path) -> float:
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0.0
+
+
+@st.cache_data(ttl=60)
+def _cached_list_brands():
+    return list_cached_brands()
+
+
+@st.cache_data(ttl=60)
+def _cached_list_ads():
+    return list_cached_ads()
+
+
+@st.cache_data(max_entries=32)
+def _cached_brand(brand_name: str, mtime: float):
+    return load_brand_from_cache(brand_name)
+
+
+@st.cache_data(max_entries=32)
+def _cached_ad(cache_id: str, mtime: float):
+    return load_ad_from_cache(cache_id)
+
+
+def _load_brand(brand_name: str):
+    return _cached_brand(brand_name, _mtime(brand_cache_path(brand_name)))
+
+
+def _load_ad(cache_id: str):
+    return _cached_ad(cache_id, _mtime(AD_CACHE_DIR / f"{cache_id}.json"))
+
+
+@st.cache_data(max_entries=32)
+def _cached_ad_png(cache_id: str, mtime: float) -> bytes:
+    # The cache already stores a PNG; serve its bytes rather than re-encoding
+    return (AD_CACHE_DIR / f"{cache_id}.png").read_bytes()
+
+
+def _content_key(data: bytes) -> str:
+    """Digest of upload bytes used as a cache key (xxh3 when available, else SHA-1)"""
+    if xxhash is not None:
+        return xxhash.xxh3_128_hexdigest(data)
+    return hashlib.sha1(data).hexdigest()
+
+
+# The cached helpers below take the digest plus an underscore-prefixed (unhashed)
+# payload, so Streamlit hashes a short key instead of multi-MB upload bytes
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _decode_upload_cached(key: str, _data: bytes) -> Image.Image:
+    img = safe_open_image(_data)
+    # Phone photos are 12-48 MP; nothing downstream needs more than this
+    img.thumbnail((MAX_UPLOAD_EDGE, MAX_UPLOAD_EDGE), Image.Resampling.LANCZOS)
+    return img
+
+
+def _decode_upload(data: bytes) -> Image.Image:
+    """Decoded upload (capped at MAX_UPLOAD_EDGE), reused across reruns while the same bytes are selected"""
+    return _decode_upload_cached(_content_key(data), data)
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _enhance_upload_cached(key: str, _data: bytes) -> Image.Image:
+    return enhance_product_image(_decode_upload_cached(key, _data))
+
+
+def _enhanced_upload(data: bytes) -> Image.Image:
+    """Decoded and enhanced upload, so re-runs on the same products skip the filters"""
+    return _enhance_upload_cached(_content_key(data), data)
+
+
+@st.cache_data(ttl=600, max_entries=16, show_spinner=False)
+def _download_cached(image_url: str) -> Optional[Image.Image]:
+    return download_image_from_url(image_url)
+
+
+@st.cache_data(ttl=3600, max_entries=16, show_spinner=False)
+def _fetch_bytes_cached(urls: tuple) -> tuple:
+    """Raw bytes for several URLs, fetched together and kept for an hour"""
+    return tuple(fetch_many_bytes(urls))
+
+
+# Sheets metadata is read on every rerun of the Auto-Sync tab. Failures raise
+# so they are not cached and the next rerun retries
+@st.cache_data(ttl=300, show_spinner=False)
+def _cached_sheet_layout(sheet_url: str) -> Dict[str, List[str]]:
+    """Worksheet name -> header row, for every tab of the sheet"""
+    layout, error = get_worksheets_and_headers(sheet_url)
+    if error:
+        raise RuntimeError(error)
+    return layout
+
+
+def _image_digest(img: Image.Image) -> tuple:
+    # Cheaper cache key for in-memory images than Streamlit's pickle-based hash
+    return img.size, img.mode, _content_key(img.tobytes())
+
+
+@st.cache_data(max_entries=8, hash_funcs={Image.Image: _image_digest})
+def _combine_uploads_cached(keys: tuple, layout: str, extra_images: tuple, _uploads: tuple) -> Image.Image:
+    images = [_decode_upload(data) for data in _uploads] + list(extra_images)
+    return combine_multiple_images_layout(images, layout)
+
+
+def _combine_uploads(uploads: tuple, layout: str, extra_images: tuple = ()) -> Image.Image:
+    """Composite of uploaded images (plus e.g. a fetched image), reused while inputs + layout are unchanged"""
+    keys = tuple(_content_key(data) for data in uploads)
+    return _combine_uploads_cached(keys, layout, extra_images, uploads)
+
+
+@st.cache_data(max_entries=64)
+def _thumbnail_cached(key: str, size: int, _data: bytes) -> bytes:
+    img = Image.open(io.BytesIO(_data))
+    img.draft("RGB", (size, size))  # JPEGs decode straight at reduced scale
+    has_alpha = "A" in img.getbands() or "transparency" in img.info
+    img = img.convert("RGBA" if has_alpha else "RGB")
+    img.thumbnail((size, size), Image.Resampling.LANCZOS)
+    with io.BytesIO() as buf:
+        img.save(buf, format="WEBP", quality=80)
+        return buf.getvalue()
+
+
+@st.cache_data(max_entries=32, hash_funcs={Image.Image: _image_digest})
+def _resize_output(img: Image.Image, dimensions: tuple) -> Image.Image:
+    """Resize to an output size, reused when the same generation is re-rendered"""
+    return smart_resize(img, dimensions)
+
+
+def _store_results(results: List[Dict]) -> None:
+    """Add finished results under the next ad_ids and mark them active"""
+    for result in results:
+        ad_id = len(st.session_state.results)
+        st.session_state.results[ad_id] = result
+        st.session_state.active_ids.add(ad_id)
+
+
+def _report_error(title: str, error: Exception) -> None:
+    """Short error in the UI; the full traceback goes to the server log under a matching id"""
+    error_id = uuid.uuid4().hex[:6]
+    logger.exception("%s [%s]", title, error_id)
+    st.error(f"❌ {title}: {type(error).__name__}: {error} (error id {error_id} - see server log)")
+
+
+def _drop_opaque_alpha(img: Image.Image) -> Image.Image:
+    """RGB copy of an RGBA image whose alpha is fully opaque (smaller, faster to encode)"""
+    if img.mode == "RGBA" and img.getchannel("A").getextrema() == (255, 255):
+        return img.convert("RGB")
+    return img
+
+
+def _finish_ad(
+    generated: Image.Image,
+    dimensions: tuple,
+    logo_configs: List[Dict],
+    result_format: str,
+    name: str,
+    ad_name: str,
+    ad_metadata: Dict
+) -> Dict:
+    """Resize, brand and encode one generated ad and queue its cache write
+
+    Returns:
+        Result dict for st.session_state.results
+    """
+    final_img = _resize_output(generated, dimensions)
+    if logo_configs:
+        final_img = add_logos_with_smart_positioning(final_img, logo_configs)
+    final_img = _drop_opaque_alpha(final_img)
+
+    size = f"{dimensions[0]}x{dimensions[1]}"
+    # Own copy for the writer thread: Image.save sets encoder state on the
+    # image object, so it can't be saved there while it's encoded here
+    save_ad_to_cache_async(
+        ad_name=ad_name,
+        ad_data={**ad_metadata, 'size': size},
+        image=final_img.copy()
+    ).add_done_callback(lambda _: _cached_list_ads.clear())
+
+    ext, mime, _ = RESULT_FORMATS[result_format]
+    return {
+        "thumb_bytes": _result_thumbnail(final_img),
+        "bytes": _encode_result(final_img, result_format),
+        "ext": ext,
+        "mime": mime,
+        "name": name,
+        "size": size
+    }
+
+
+def _encode_result(img: Image.Image, fmt: str) -> bytes:
+    """Encode a finished ad with one of RESULT_FORMATS"""
+    # Take the bytes once and release the buffer straight away
+    with io.BytesIO() as buf:
+        img.save(buf, format=fmt, **RESULT_FORMATS[fmt][2])
+        return buf.getvalue()
+
+
+def _result_thumbnail(img: Image.Image, size: int = 512) -> bytes:
+    """Small JPEG of a finished ad for the results grid"""
+    thumb = img.convert("RGB") if img.mode != "RGB" else img.copy()
+    thumb.thumbnail((size, size), Image.Resampling.BILINEAR)
+    with io.BytesIO() as buf:
+        thumb.save(buf, format="JPEG", quality=80)
+        return buf.getvalue()
+
+
+def _thumbnail(data: bytes, size: int = 256) -> bytes:
+    """Small WebP preview of an uploaded image so reruns don't ship full-size pixels"""
+    return _thumbnail_cached(_content_key(data), size, data)
+
+
+@lru_cache(maxsize=1)
+def _moviepy() -> Optional[SimpleNamespace]:
+    """moviepy's editor API, imported on first use (None if not installed)"""
+    try:
+        from moviepy.editor import VideoClip
+    except ImportError:
+        return None
+    return SimpleNamespace(VideoClip=VideoClip)
+
+
+@st.cache_resource
+def _style_categories() -> Dict[str, List[str]]:
+    """Enhanced style themes grouped by category, built once per process"""
+    categories = {"None": ["None - Custom Style"]}
+    for style_name in ENHANCED_STYLE_THEMES:
+        categories.setdefault(style_name.split(' - ', 1)[0], []).append(style_name)
+    return categories
+
 
 # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 # MAIN APP
 # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 
+# Widget changes inside a fragment rerun only that fragment, not the whole app
+# (st.fragment on Streamlit >= 1.37, experimental_fragment before; plain call otherwise)
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
+
+
+def _inject_css():
+    """Emit the stylesheet as raw HTML, skipping the markdown pass where supported"""
+    if hasattr(st, "html"):
+        # Style-only st.html goes to the event container: no markdown parse, no layout space
+        st.html(_css_blob())
+    else:
+        st.markdown(_css_blob(), unsafe_allow_html=True)
+
+
 def main():
+    _inject_css()
+
     st.title("🎯 ULTRA Brand Extractor + AI Ad Generator (MODULAR)")
     st.markdown("### Extract brand intelligence with confidence scoring & AI insights")
 
@@ -116,7 +491,9 @@ def main():
     if 'generated_ads' not in st.session_state:
         st.session_state.generated_ads = []
     if 'results' not in st.session_state:
-        st.session_state.results = []
+        st.session_state.results = {}  # ad_id -> result, in generation order
+    if 'active_ids' not in st.session_state:
+        st.session_state.active_ids = set()  # ad_ids not removed from the upload list
 
     # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
     # SIDEBAR: Cached Brands
@@ -125,29 +502,28 @@ def main():
     with st.sidebar:
         st.header("📚 Cached Brands")
         st.caption("💾 Permanent cache (never expires)")
-        cached_brands = list_cached_brands()
+        cached_brands = _cached_list_brands()
 
         if cached_brands:
             selected_cache = st.selectbox("Select cached brand", [""] + cached_brands)
             if selected_cache:
                 # Show cache info
-                cached_data = load_brand_from_cache(selected_cache)
+                cached_data = _load_brand(selected_cache)
                 if cached_data:
                     with st.expander("ℹ️ Cache Info", expanded=False):
-                        st.write(f"**Extracted:** {cached_data.get('extraction_date', 'Unknown')[:10]}")
+                        st.write(f"**Extracted:** {cached_data.get('extraction_date_short') or cached_data.get('extraction_date', 'Unknown')[:10]}")
                         st.write(f"**Pages:** {cached_data.get('metadata', {}).get('pages_crawled', 'N/A')}")
                         st.write(f"**Category:** {cached_data.get('brand_identity', {}).get('category_niche', {}).get('primary_category', 'N/A')}")
-                        st.write(f"**Size:** {len(str(cached_data))} chars")
+                        st.write(f"**Size:** {os.path.getsize(brand_cache_path(selected_cache)):,} bytes")
 
                 # Action buttons
                 col1, col2, col3 = st.columns(3)
                 with col1:
                     if st.button("📂 Load", use_container_width=True):
-                        cached_data = load_brand_from_cache(selected_cache)
                         if cached_data:
                             st.session_state.brand_data = cached_data
                             st.success(f"✅ Loaded {selected_cache}")
-                            st.rerun()
+                            st.session_state._dirty = True
                 with col2:
                     if st.button("🔄 Update", use_container_width=True, help="Re-extract and replace cached data"):
                         # Pre-fill extraction form
@@ -157,10 +533,11 @@ def main():
                 with col3:
                     if st.button("🗑️ Delete", use_container_width=True, type="secondary"):
                         if delete_brand_cache(selected_cache):
+                            _cached_list_brands.clear()
                             st.success(f"🗑️ Deleted {selected_cache}")
                             if st.session_state.brand_data and st.session_state.brand_data.get('brand_name') == selected_cache:
                                 st.session_state.brand_data = None
-                            st.rerun()
+                            st.session_state._dirty = True
         else:
             st.info("No cached brands yet")
 
@@ -168,15 +545,14 @@ def main():
         st.markdown("---")
         st.header("🎨 Cached Generated Ads")
         st.caption("💾 Previously generated ads")
-        cached_ads = list_cached_ads()
+        cached_ads = _cached_list_ads()
 
         if cached_ads:
-            # Display options for cached ads
-            ad_options = [f"{ad['brand_name']} - {ad['size']} ({ad['cached_at'][:10]})" for ad in cached_ads]
+            # Labels are pre-built by list_cached_ads (cached with the listing)
             selected_ad_idx = st.selectbox(
                 "Select cached ad",
-                range(len(ad_options)),
-                format_func=lambda x: ad_options[x] if x < len(ad_options) else "",
+                range(len(cached_ads)),
+                format_func=lambda x: cached_ads[x]['label'] if x < len(cached_ads) else "",
                 key="cached_ad_selector"
             )
 
@@ -184,32 +560,35 @@ def main():
                 selected_ad = cached_ads[selected_ad_idx]
                 cache_id = selected_ad['cache_id']
 
-                # Load and preview the ad
-                cached_ad_data = load_ad_from_cache(cache_id)
-                if cached_ad_data:
-                    st.image(cached_ad_data['image'], caption=f"{selected_ad['brand_name']} - {selected_ad['size']}", use_column_width=True)
-
-                    with st.expander("ℹ️ Ad Info", expanded=False):
-                        metadata = cached_ad_data['metadata']
-                        st.write(f"**Brand:** {metadata.get('brand_name', 'N/A')}")
-                        st.write(f"**Size:** {metadata.get('size', 'N/A')}")
-                        st.write(f"**Generated:** {metadata.get('cached_at', 'N/A')[:10]}")
-                        st.write(f"**Style:** {metadata.get('style', 'N/A')}")
-                        st.write(f"**Concept:** {metadata.get('concept', 'N/A')}")
-                        if metadata.get('prompt'):
-                            with st.expander("📝 Prompt Used"):
-                                st.text(metadata['prompt'])
-
+                png_path = AD_CACHE_DIR / f"{cache_id}.png"
+
+                # Expander bodies run even when collapsed, so the PNG decode
+                # is gated on an explicit toggle instead
+                if st.toggle("👁️ Preview", key="cached_ad_preview"):
+                    cached_ad_data = _load_ad(cache_id)
+                    if cached_ad_data:
+                        # Sidebar-sized WebP from the stored PNG rather than the full-res image
+                        st.image(_thumbnail(_cached_ad_png(cache_id, _mtime(png_path)), size=512), caption=f"{selected_ad['brand_name']} - {selected_ad['size']}", use_column_width=True)
+
+                        with st.expander("ℹ️ Ad Info", expanded=False):
+                            metadata = cached_ad_data['metadata']
+                            st.write(f"**Brand:** {metadata.get('brand_name', 'N/A')}")
+                            st.write(f"**Size:** {metadata.get('size', 'N/A')}")
+                            st.write(f"**Generated:** {metadata.get('cached_at_short') or metadata.get('cached_at', 'N/A')[:10]}")
+                            st.write(f"**Style:** {metadata.get('style', 'N/A')}")
+                            st.write(f"**Concept:** {metadata.get('concept', 'N/A')}")
+                            if metadata.get('prompt'):
+                                with st.expander("📝 Prompt Used"):
+                                    st.text(metadata['prompt'])
+
+                if png_path.exists():
                     # Action buttons
                     col1, col2 = st.columns(2)
                     with col1:
                         # Download button
-                        import io
-                        buf = io.BytesIO()
-                        cached_ad_data['image'].save(buf, format='PNG', quality=95)
                         st.download_button(
                             "⬇️ Download",
-                            data=buf.getvalue(),
+                            data=_cached_ad_png(cache_id, _mtime(png_path)),
                             file_name=f"{cache_id}.png",
                             mime="image/png",
                             use_container_width=True
@@ -217,14 +596,18 @@ def main():
                     with col2:
                         if st.button("🗑️ Delete", use_container_width=True, type="secondary", key="delete_cached_ad"):
                             if delete_ad_cache(cache_id):
+                                _cached_list_ads.clear()
                                 st.success(f"🗑️ Deleted cached ad")
-                                st.rerun()
+                                st.session_state._dirty = True
         else:
             st.info("No cached ads yet. Generate some ads to see them here!")
 
     # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
     # TABS
     # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+    # Extract, Brand Profile and Auto-Sync are fragments. The sidebar and
+    # Generate Ads stay in the full run because other sections read the state
+    # they write (update_brand flags, results/active_ids).
 
     tab1, tab2, tab3, tab4 = st.tabs(["🔍 Extract Brand", "🎨 Generate Ads", "📊 Brand Profile", "🔄 Auto-Sync"])
 
@@ -232,7 +615,8 @@ def main():
     # TAB 1: EXTRACT BRAND
     # ════════════════════════════════════════════════════════════
 
-    with tab1:
+    @_fragment
+    def _tab_extract_brand():
         st.subheader("🔍 Extract Brand Intelligence")
 
         # Check if updating existing cached brand
@@ -243,7 +627,7 @@ def main():
             st.warning(f"🔄 **Update Mode:** Re-extracting {update_brand_name} (will replace cached data)")
 
             # Load existing cached data to get URL
-            existing_data = load_brand_from_cache(update_brand_name)
+            existing_data = _load_brand(update_brand_name)
             existing_url = existing_data.get('metadata', {}).get('url', '') if existing_data else ''
         else:
             update_brand_name = ''
@@ -309,6 +693,7 @@ def main():
                         # Save to cache only if user enabled it
                         if save_to_cache:
                             if save_brand_to_cache(brand_name, brand_data):
+                                _cached_list_brands.clear()
                                 if update_mode:
                                     st.success(f"✅ Brand '{brand_name}' updated in permanent cache!")
                                 else:
@@ -339,30 +724,26 @@ def main():
                         - Try a different page on the same website
                         """)
 
+    with tab1:
+        _tab_extract_brand()
+
     # ════════════════════════════════════════════════════════════
     # TAB 2: GENERATE ADS
     # ════════════════════════════════════════════════════════════
     with tab2:
         st.subheader("🎨 Generate AI Ads - Enhanced Edition")
     
-        if not st.session_state.brand_data:
+        # Bound once; nothing below reassigns brand_data during this run
+        brand_data = st.session_state.brand_data
+        ad_content = (brand_data or {}).get('ad_content', {})
+
+        if not brand_data:
             st.warning("⚠️ Please extract brand intelligence first in the 'Extract Brand' tab")
             st.info("💡 Or you can still generate ads without brand extraction - just upload images and logos manually!")
 
-        # Import enhanced modules at runtime
-        try:
-            from ad_generator_enhanced import (
-                ENHANCED_STYLE_THEMES,
-                AD_CONCEPTS,
-                generate_positive_prompt_elements,
-                generate_negative_prompt_elements,
-                combine_multiple_images_layout,
-                add_logo_with_smart_positioning
-            )
-            enhanced_available = True
-        except ImportError:
+        enhanced_available = ENHANCED_AVAILABLE
+        if not enhanced_available:
             st.warning("⚠️ Enhanced features not available. Using basic mode.")
-            enhanced_available = False
 
         # ========== PRODUCT IMAGES SECTION ==========
         st.markdown("### 🖼️ Product Images")
@@ -387,8 +768,7 @@ def main():
                 for idx, img_file in enumerate(product_images[:4]):
                     with preview_cols[idx]:
                         try:
-                            preview = safe_open_image(img_file)
-                            st.image(preview, use_column_width=True, caption=f"Image {idx+1}")
+                            st.image(_thumbnail(img_file.getvalue()), use_column_width=True, caption=f"Image {idx+1}")
                         except Exception as e:
                             st.error(f"Error loading image {idx+1}")
 
@@ -400,9 +780,8 @@ def main():
                     with st.expander("✏️ Add custom text/price for each product", expanded=False):
                         st.caption("Add specific details for each product - these will be used in individual ad generation")
 
-                        # Initialize session state for product details
-                        if 'product_details' not in st.session_state:
-                            st.session_state.product_details = {}
+                        # Collect locally; session state is written once below
+                        product_details = {}
 
                         for idx, img_file in enumerate(product_images):
                             st.markdown(f"**Product {idx+1}:** `{img_file.name}`")
@@ -427,8 +806,7 @@ def main():
                                     placeholder="e.g., Limited Edition"
                                 )
 
-                            # Store in session state
-                            st.session_state.product_details[idx] = {
+                            product_details[idx] = {
                                 'name': product_name,
                                 'price': product_price,
                                 'message': product_message,
@@ -438,6 +816,10 @@ def main():
                             if idx < len(product_images) - 1:
                                 st.markdown("---")
 
+                        # Store in session state (only when something changed)
+                        if st.session_state.get('product_details') != product_details:
+                            st.session_state.product_details = product_details
+
                 # Initialize generation_mode and image_layout as session state for persistence
                 if 'generation_mode' not in st.session_state:
                     st.session_state.generation_mode = "🔀 Multi-Image Reference (AI blends all)"
@@ -493,35 +875,51 @@ def main():
                         st.error("❌ Failed to fetch image")
 
             # Use extracted brand images
-            if st.session_state.brand_data:
-                brand_images = st.session_state.brand_data.get('10_images_and_ads', {}).get('images', [])
+            if brand_data:
+                brand_images = brand_data.get('10_images_and_ads', {}).get('images', [])
                 if brand_images:
                     st.markdown("**🖼️ Use Extracted Images**")
 
+                    # Get base URL from brand data for relative paths
+                    base_url = brand_data.get('metadata', {}).get('url', '')
+                    shown_urls = [
+                        img_data.get('url', '') if isinstance(img_data, dict) else img_data
+                        for img_data in brand_images[:10]  # Show first 10
+                    ]
+
+                    # Warm all downloads in the background once per brand so "Use" is instant
+                    prefetch_id = (base_url, tuple(shown_urls))
+                    if st.session_state.get('brand_image_prefetch_id') != prefetch_id:
+                        st.session_state.brand_image_prefetch = prefetch_images(
+                            [url for url in shown_urls if url], base_url=base_url
+                        )
+                        st.session_state.brand_image_prefetch_id = prefetch_id
+
                     # Show selectable extracted images
                     with st.expander(f"📸 {len(brand_images)} Images from Brand"):
-                        for idx, img_data in enumerate(brand_images[:10]):  # Show first 10
-                            img_url = img_data.get('url', '') if isinstance(img_data, dict) else img_data
-                            if img_url:
-                                col1, col2 = st.columns([1, 4])
-                                with col1:
-                                    if st.button("Use", key=f"use_brand_img_{idx}"):
-                                        with st.spinner(f"Loading image {idx+1}..."):
-                                            # Get base URL from brand data for relative paths
-                                            base_url = st.session_state.brand_data.get('metadata', {}).get('url', '')
-                                            fetched = download_image_from_url(img_url, base_url=base_url)
-                                            if fetched:
-                                                st.session_state.fetched_product_image = fetched
-                                                st.success("✅ Image loaded!")
-                                                st.rerun()
-                                with col2:
-                                    st.caption(f"{img_url[:60]}..." if len(img_url) > 60 else img_url)
+                        # One picker + one button rather than a button/caption pair per image
+                        choice_idx = st.radio(
+                            "Pick an image",
+                            [idx for idx, img_url in enumerate(shown_urls) if img_url],
+                            format_func=lambda i: f"{shown_urls[i][:60]}..." if len(shown_urls[i]) > 60 else shown_urls[i],
+                            key="brand_img_choice"
+                        )
+                        if choice_idx is not None and st.button("Use", key="use_brand_img"):
+                            with st.spinner(f"Loading image {choice_idx+1}..."):
+                                fetched, fetch_error = st.session_state.brand_image_prefetch[shown_urls[choice_idx]].result()
+                                if fetched:
+                                    st.session_state.fetched_product_image = fetched
+                                    st.success("✅ Image loaded!")
+                                    st.session_state._dirty = True
+                                else:
+                                    if fetch_error:
+                                        st.warning(fetch_error)
+                                    st.error("❌ Failed to load image")
 
         st.markdown("---")
 
         # ========== EXTRACTED TAGLINES & MESSAGES ==========
-        if st.session_state.brand_data:
-            ad_content = st.session_state.brand_data.get('ad_content', {})
+        if brand_data:
             headlines = ad_content.get('headlines', [])
             subtext = ad_content.get('subtext', [])
             ctas = ad_content.get('ctas', [])
@@ -592,8 +990,7 @@ def main():
                 for idx, img_file in enumerate(collection_images[:10]):
                     with preview_cols[idx % 5]:
                         try:
-                            preview = safe_open_image(img_file)
-                            st.image(preview, use_column_width=True, caption=f"#{idx+1}")
+                            st.image(_thumbnail(img_file.getvalue()), use_column_width=True, caption=f"#{idx+1}")
                         except Exception as e:
                             st.error(f"Error loading image {idx+1}")
 
@@ -629,13 +1026,8 @@ def main():
     
         with col_style:
             if enhanced_available:
-                # Group styles by category
-                style_categories = {"None": ["None - Custom Style"]}
-                for style_name, description in ENHANCED_STYLE_THEMES.items():
-                    category = style_name.split(' - ')[0]
-                    if category not in style_categories:
-                        style_categories[category] = []
-                    style_categories[category].append(style_name)
+                # Styles grouped by category (computed once, read-only)
+                style_categories = _style_categories()
 
                 selected_category = st.selectbox(
                     "🎨 Style Category:",
@@ -671,14 +1063,14 @@ def main():
                     )
             else:
                 # Fallback to basic styles
-                selected_style = st.selectbox("Ad Style", list(AD_STYLE_CATEGORIES.keys()))
+                selected_style = st.selectbox("Ad Style", AD_STYLE_NAMES)
                 style_description = None  # No editing in basic mode
     
         with col_concept:
             if enhanced_available:
                 selected_concept = st.selectbox(
                     "💡 Ad Concept:",
-                    options=list(AD_CONCEPTS.keys()),
+                    options=AD_CONCEPT_NAMES,
                     key="selected_concept_enhanced",
                     help="Choose advertising concept approach or 'None' for custom"
                 )
@@ -733,49 +1125,53 @@ def main():
                 )
 
                 if logo1_file:
-                    logo1_img = safe_open_image(logo1_file)
-                    st.image(logo1_img, width=150, caption="Logo 1 Preview")
-
-                    # Horizontal position control
-                    logo1_h_pos = st.slider(
-                        "Horizontal Position (px from left):",
-                        min_value=-50,
-                        max_value=100,
-                        value=20,
-                        step=5,
-                        key="logo1_h_pos",
-                        help="Distance from left edge (negative = outside, 0 = corner, positive = inside)"
-                    )
+                    logo1_img = _decode_upload(logo1_file.getvalue())
+                    st.image(_thumbnail(logo1_file.getvalue()), width=150, caption="Logo 1 Preview")
+
+                    # Position/size settle in one rerun on Apply rather than one per slider drag
+                    with st.form("logo1_form", border=False):
+                        # Horizontal position control
+                        logo1_h_pos = st.slider(
+                            "Horizontal Position (px from left):",
+                            min_value=-50,
+                            max_value=100,
+                            value=20,
+                            step=5,
+                            key="logo1_h_pos",
+                            help="Distance from left edge (negative = outside, 0 = corner, positive = inside)"
+                        )
 
-                    # Vertical position control
-                    logo1_v_pos = st.slider(
-                        "Vertical Position (px from top):",
-                        min_value=-50,
-                        max_value=100,
-                        value=20,
-                        step=5,
-                        key="logo1_v_pos",
-                        help="Distance from top edge (negative = outside, 0 = corner, positive = inside)"
-                    )
+                        # Vertical position control
+                        logo1_v_pos = st.slider(
+                            "Vertical Position (px from top):",
+                            min_value=-50,
+                            max_value=100,
+                            value=20,
+                            step=5,
+                            key="logo1_v_pos",
+                            help="Distance from top edge (negative = outside, 0 = corner, positive = inside)"
+                        )
 
-                    # Size control
-                    logo1_size = st.slider(
-                        "Logo Size (% of image height):",
-                        min_value=3.0,
-                        max_value=25.0,
-                        value=8.0,
-                        step=0.5,
-                        key="logo1_size",
-                        help="Logo height as percentage of image height"
-                    )
+                        # Size control
+                        logo1_size = st.slider(
+                            "Logo Size (% of image height):",
+                            min_value=3.0,
+                            max_value=25.0,
+                            value=8.0,
+                            step=0.5,
+                            key="logo1_size",
+                            help="Logo height as percentage of image height"
+                        )
 
-                    # Background removal
-                    logo1_remove_bg = st.checkbox(
-                        "Remove Background",
-                        value=True,
-                        key="logo1_rmbg",
-                        help="Auto-remove logo background"
-                    )
+                        # Background removal
+                        logo1_remove_bg = st.checkbox(
+                            "Remove Background",
+                            value=True,
+                            key="logo1_rmbg",
+                            help="Auto-remove logo background"
+                        )
+
+                        st.form_submit_button("Apply Logo 1", use_container_width=True)
 
                     logo_configs.append({
                         "image": logo1_img,
@@ -799,49 +1195,53 @@ def main():
                 )
 
                 if logo2_file:
-                    logo2_img = safe_open_image(logo2_file)
-                    st.image(logo2_img, width=150, caption="Logo 2 Preview")
-
-                    # Horizontal position control (from right edge)
-                    logo2_h_pos = st.slider(
-                        "Horizontal Position (px from right):",
-                        min_value=-50,
-                        max_value=100,
-                        value=20,
-                        step=5,
-                        key="logo2_h_pos",
-                        help="Distance from right edge (negative = outside, 0 = corner, positive = inside)"
-                    )
+                    logo2_img = _decode_upload(logo2_file.getvalue())
+                    st.image(_thumbnail(logo2_file.getvalue()), width=150, caption="Logo 2 Preview")
+
+                    # Position/size settle in one rerun on Apply rather than one per slider drag
+                    with st.form("logo2_form", border=False):
+                        # Horizontal position control (from right edge)
+                        logo2_h_pos = st.slider(
+                            "Horizontal Position (px from right):",
+                            min_value=-50,
+                            max_value=100,
+                            value=20,
+                            step=5,
+                            key="logo2_h_pos",
+                            help="Distance from right edge (negative = outside, 0 = corner, positive = inside)"
+                        )
 
-                    # Vertical position control
-                    logo2_v_pos = st.slider(
-                        "Vertical Position (px from top):",
-                        min_value=-50,
-                        max_value=100,
-                        value=20,
-                        step=5,
-                        key="logo2_v_pos",
-                        help="Distance from top edge (negative = outside, 0 = corner, positive = inside)"
-                    )
+                        # Vertical position control
+                        logo2_v_pos = st.slider(
+                            "Vertical Position (px from top):",
+                            min_value=-50,
+                            max_value=100,
+                            value=20,
+                            step=5,
+                            key="logo2_v_pos",
+                            help="Distance from top edge (negative = outside, 0 = corner, positive = inside)"
+                        )
 
-                    # Size control
-                    logo2_size = st.slider(
-                        "Logo Size (% of image height):",
-                        min_value=3.0,
-                        max_value=25.0,
-                        value=8.0,
-                        step=0.5,
-                        key="logo2_size",
-                        help="Logo height as percentage of image height"
-                    )
+                        # Size control
+                        logo2_size = st.slider(
+                            "Logo Size (% of image height):",
+                            min_value=3.0,
+                            max_value=25.0,
+                            value=8.0,
+                            step=0.5,
+                            key="logo2_size",
+                            help="Logo height as percentage of image height"
+                        )
 
-                    # Background removal
-                    logo2_remove_bg = st.checkbox(
-                        "Remove Background",
-                        value=True,
-                        key="logo2_rmbg",
-                        help="Auto-remove logo background"
-                    )
+                        # Background removal
+                        logo2_remove_bg = st.checkbox(
+                            "Remove Background",
+                            value=True,
+                            key="logo2_rmbg",
+                            help="Auto-remove logo background"
+                        )
+
+                        st.form_submit_button("Apply Logo 2", use_container_width=True)
 
                     # For top-right, store distance from right edge
                     logo_configs.append({
@@ -858,8 +1258,8 @@ def main():
         with logo_tabs[1]:
             st.markdown("#### Use Extracted Brand Logos")
 
-            if st.session_state.brand_data:
-                logos = st.session_state.brand_data.get('1_brand_logo', {})
+            if brand_data:
+                logos = brand_data.get('1_brand_logo', {})
 
                 col_extracted1, col_extracted2 = st.columns(2)
 
@@ -869,7 +1269,7 @@ def main():
                         try:
                             st.image(logos['light_logo'], width=200)
                             if st.button("Use Light Logo", key="use_light_logo"):
-                                extracted_logo = download_image_from_url(logos['light_logo'])
+                                extracted_logo = _download_cached(logos['light_logo'])
                                 if extracted_logo:
                                     logo_configs.append({
                                         "image": extracted_logo,
@@ -890,7 +1290,7 @@ def main():
                         try:
                             st.image(logos['dark_logo'], width=200)
                             if st.button("Use Dark Logo", key="use_dark_logo"):
-                                extracted_logo = download_image_from_url(logos['dark_logo'])
+                                extracted_logo = _download_cached(logos['dark_logo'])
                                 if extracted_logo:
                                     logo_configs.append({
                                         "image": extracted_logo,
@@ -917,12 +1317,12 @@ def main():
         with col_prompts1:
             st.markdown("**🎯 Positive Prompt (Do's)**")
 
-            if enhanced_available and st.session_state.brand_data:
+            if enhanced_available and brand_data:
                 # Auto-generate positive elements
                 auto_positive = generate_positive_prompt_elements(
                     selected_concept if 'selected_concept' in locals() else "Hero Product",
                     selected_style if 'selected_style' in locals() else "Product - Hero Shot",
-                    st.session_state.brand_data
+                    brand_data
                 )
             else:
                 auto_positive = "High quality professional photography, crystal clear details, proper exposure, accurate colors, clean composition"
@@ -981,24 +1381,27 @@ def main():
             else:
                 # Video generation options
                 st.markdown("**🎥 Video Settings:**")
-                video_duration = st.slider(
-                    "Duration per image (seconds):",
-                    min_value=1.0,
-                    max_value=5.0,
-                    value=2.0,
-                    step=0.5,
-                    key="video_duration"
-                )
-                video_transition = st.selectbox(
-                    "Transition Effect:",
-                    ["Fade", "Slide", "Zoom", "None"],
-                    key="video_transition"
-                )
-                video_size = st.selectbox(
-                    "Video Size:",
-                    ["1080x1080 (Square)", "1080x1920 (Story)", "1920x1080 (Landscape)"],
-                    key="video_size"
-                )
+                with st.form("video_settings_form", border=False):
+                    video_duration = st.slider(
+                        "Duration per image (seconds):",
+                        min_value=1.0,
+                        max_value=5.0,
+                        value=2.0,
+                        step=0.5,
+                        key="video_duration"
+                    )
+                    video_transition = st.selectbox(
+                        "Transition Effect:",
+                        ["Fade", "Slide", "Zoom", "None"],
+                        key="video_transition"
+                    )
+                    video_size = st.selectbox(
+                        "Video Size:",
+                        ["1080x1080 (Square)", "1080x1920 (Story)", "1920x1080 (Landscape)"],
+                        key="video_size"
+                    )
+
+                    st.form_submit_button("Apply video settings", use_container_width=True)
 
                 st.info("""
                 💡 **Video Collection Ad**:
@@ -1025,21 +1428,58 @@ def main():
             )
 
         with col_settings3:
-            model_options = [f"{v['name']}" for k, v in AI_MODELS.items()]
-            model_keys = list(AI_MODELS.keys())
             selected_model_idx = st.selectbox(
                 "AI Model:",
-                range(len(model_options)),
-                format_func=lambda x: model_options[x],
+                range(len(AI_MODEL_KEYS)),
+                format_func=AI_MODEL_NAMES.__getitem__,
                 key="model_enhanced"
             )
-            selected_model = model_keys[selected_model_idx]
+            selected_model = AI_MODEL_KEYS[selected_model_idx]
+            preview_mode = st.checkbox(
+                "⚡ Preview mode (fast draft)",
+                value=False,
+                key="preview_mode_enhanced",
+                help="Render a quick draft with FLUX Schnell (4 steps); turn off for the final render with the selected model"
+            )
+            effective_model = PREVIEW_MODEL_KEY if preview_mode else selected_model
+            reuse_cached = st.checkbox(
+                "💾 Reuse identical results",
+                value=True,
+                key="reuse_cached_enhanced",
+                help="Return the saved ad instantly (and free) when nothing changed since an earlier generation; turn off for a fresh variation on every click"
+            )
+            reuse_similar = st.checkbox(
+                "♻️ Reuse similar drafts",
+                value=False,
+                key="reuse_similar_enhanced",
+                disabled=not reuse_cached or effective_model not in IMG2IMG_MODELS,
+                help="Start from an earlier ad with a near-identical prompt and only refine it (FLUX Dev only) - faster and cheaper when iterating on small prompt tweaks"
+            )
+            num_variants = st.number_input(
+                "🎲 Variants per size",
+                min_value=1,
+                max_value=MAX_OUTPUTS_PER_REQUEST,
+                value=1,
+                key="variants_enhanced",
+                help="Generate several takes of each ad to pick from. Always fresh (never cached); "
+                     + ("FLUX Dev/Schnell return them all from one prediction" if effective_model in MULTI_OUTPUT_MODELS
+                        else "this model runs one prediction per variant")
+            )
+            webp_output = st.checkbox(
+                "🗜️ Lossless WebP output",
+                value=False,
+                key="webp_output_enhanced",
+                help="Save ads as lossless WebP (smaller files) instead of PNG"
+            )
+            result_format = "WEBP" if webp_output else "PNG"
+            if negative_prompt.strip() and effective_model not in NEGATIVE_PROMPT_MODELS:
+                st.caption("ℹ️ This model has no negative prompt input - the Don'ts above will be ignored")
     
         # ========== FINAL PROMPT PREVIEW ==========
         st.markdown("### 📄 Final Prompt Preview")
 
-        if st.session_state.brand_data:
-            brand_identity = st.session_state.brand_data['brand_identity']
+        if brand_data:
+            brand_identity = brand_data['brand_identity']
             brand_name = brand_identity.get('brand_name', 'Product')
             market_pos = brand_identity.get('market_position', {}).get('position', 'premium')
             category = brand_identity.get('category_niche', {}).get('primary_category', 'product').replace('_', ' ')
@@ -1054,51 +1494,37 @@ def main():
                 concept_desc = "Professional advertisement"
 
             # Extract ad content for enhanced prompts
-            ad_content = st.session_state.brand_data.get('ad_content', {})
             headlines = ad_content.get('headlines', [])
             ctas = ad_content.get('ctas', [])
             features = ad_content.get('features', [])
             ingredients = ad_content.get('ingredients', [])
 
             # Build ad content section
-            ad_content_section = ""
+            ad_content_lines = []
             if headlines:
-                ad_content_section += f"\nHEADLINE/TEXT: {headlines[0]}\n"
+                ad_content_lines.append(f"\nHEADLINE/TEXT: {headlines[0]}")
             if ctas:
-                ad_content_section += f"CALL-TO-ACTION: {', '.join(ctas[:3])}\n"
+                ad_content_lines.append(f"CALL-TO-ACTION: {', '.join(ctas[:3])}")
             if "Ingredient" in selected_concept and ingredients:
-                ad_content_section += f"INGREDIENTS: {', '.join(ingredients[:10])}\n"
+                ad_content_lines.append(f"INGREDIENTS: {', '.join(ingredients[:10])}")
             if features and ("Feature" in selected_concept or "Product" in selected_concept):
-                ad_content_section += f"FEATURES: {', '.join(features[:5])}\n"
-
-            auto_final_prompt = f"""Professional advertising photograph.
-
-BRAND: {brand_name} - {market_pos} {category}
-
-STYLE: {style_desc}
-
-CONCEPT: {concept_desc}
-{ad_content_section}
-POSITIVE ELEMENTS (DO):
-{positive_prompt}
-
-COMPOSITION GUIDELINES:
-- Product clearly visible and prominent
-- Professional commercial photography quality
-- Clean, uncluttered composition
-- Reserve top area for logos (will be added after generation)
-- High quality 8K details, crystal clear focus
-"""
+                ad_content_lines.append(f"FEATURES: {', '.join(features[:5])}")
+            ad_content_section = "\n".join(ad_content_lines) + "\n" if ad_content_lines else ""
+
+            auto_final_prompt = BRAND_PROMPT_TEMPLATE.format_map({
+                'brand_name': brand_name,
+                'market_pos': market_pos,
+                'category': category,
+                'style_desc': style_desc,
+                'concept_desc': concept_desc,
+                'ad_content_section': ad_content_section,
+                'positive_prompt': positive_prompt
+            })
         else:
-            auto_final_prompt = f"""Professional advertising photograph.
-
-STYLE: {selected_style if 'selected_style' in locals() else 'Professional'}
-
-POSITIVE ELEMENTS (DO):
-{positive_prompt}
-
-High quality, professional, 8K resolution, crystal clear details.
-"""
+            auto_final_prompt = BASIC_PROMPT_TEMPLATE.format_map({
+                'style': selected_style if 'selected_style' in locals() else 'Professional',
+                'positive_prompt': positive_prompt
+            })
     
         final_prompt = st.text_area(
         "Final Generation Prompt:",
@@ -1130,20 +1556,27 @@ High quality, professional, 8K resolution, crystal clear details.
                     try:
                         st.info("🎥 Generating video collection ad...")
 
-                        # Check if moviepy is installed
-                        try:
-                            from moviepy.editor import ImageClip, concatenate_videoclips, CompositeVideoClip
-                            from moviepy.video.fx.all import fadein, fadeout
-                        except ImportError:
-                            st.error("⚠️ Please install moviepy: `pip install moviepy`")
-                            st.stop()
-
-                        # Prepare images
-                        clips = []
-                        for idx, img_file in enumerate(product_images):
-                            img = safe_open_image(img_file)
+                        # Content-address the render so unchanged inputs reuse the mp4
+                        brand_name_clean = brand_data['brand_identity'].get('brand_name', 'Product').replace(' ', '_') if brand_data else 'Ad'
+                        video_hash = hashlib.blake2b(digest_size=8)
+                        for img_file in product_images:
+                            video_hash.update(img_file.getvalue())
+                        video_hash.update(f"{video_size}|{video_duration}|{video_transition}".encode())
+                        video_filename = f"{brand_name_clean}_collection_video.mp4"
+                        video_path = str(VIDEO_CACHE_DIR / f"{brand_name_clean}_{video_hash.hexdigest()}.mp4")
+
+                        if (os.path.exists(video_path)
+                                and time.time() - os.path.getmtime(video_path) < VIDEO_CACHE_TTL_SECONDS):
+                            os.utime(video_path)  # Mark as recently used for eviction
+                            st.info("♻️ Same images and settings as an earlier render - reusing that video")
+                        else:
+                            # Check if moviepy is installed
+                            mp = _moviepy()
+                            if mp is None:
+                                st.error("⚠️ Please install moviepy: `pip install moviepy`")
+                                st.stop()
 
-                            # Parse video size
+                            # Parse video size (same for every frame)
                             if "Square" in video_size:
                                 target_size = (1080, 1080)
                             elif "Story" in video_size:
@@ -1151,51 +1584,84 @@ High quality, professional, 8K resolution, crystal clear details.
                             else:
                                 target_size = (1920, 1080)
 
-                            # Resize image
-                            img_resized = img.resize(target_size, Image.Resampling.LANCZOS)
-
-                            # Save temporarily
-                            import tempfile
-                            temp_path = tempfile.NamedTemporaryFile(suffix=".png", delete=False).name
-                            img_resized.save(temp_path)
-
-                            # Create clip
-                            clip = ImageClip(temp_path).set_duration(video_duration)
-
-                            # Add transitions
-                            if video_transition == "Fade":
-                                clip = fadein(clip, 0.5).fadeout(0.5)
-
-                            clips.append(clip)
-
-                        # Concatenate clips
-                        final_video = concatenate_videoclips(clips, method="compose")
-
-                        # Save video
-                        brand_name_clean = st.session_state.brand_data['brand_identity'].get('brand_name', 'Product').replace(' ', '_') if st.session_state.brand_data else 'Ad'
-                        video_filename = f"{brand_name_clean}_collection_video.mp4"
-                        video_path = os.path.join("ad_cache", video_filename)
-
-                        st.info("💾 Rendering video (this may take a minute)...")
-                        final_video.write_videofile(video_path, fps=30, codec='libx264')
+                            def _prep_frame(img_file):
+                                img = safe_open_image(img_file)
+                                # Resize image (skipped when it already matches)
+                                img_resized = img if img.size == target_size else smart_resize(img, target_size)
+                                return np.asarray(img_resized)  # safe_open_image already yields RGB
+
+                            # Decode + resize in parallel (Pillow releases the GIL while resampling)
+                            with ThreadPoolExecutor(max_workers=min(8, len(product_images))) as executor:
+                                frames = list(executor.map(_prep_frame, product_images))
+
+                            fade = 0.5 if video_transition == "Fade" else 0.0
+
+                            def make_frame(t):
+                                # One clip for the whole slideshow: pick the slide by time
+                                # (concatenating per-image clips builds a compositor tree)
+                                idx = min(int(t // video_duration), len(frames) - 1)
+                                frame = frames[idx]
+                                if not fade:
+                                    return frame
+                                # Fade in/out from black with integer math on uint8 (MoviePy's
+                                # fadein/fadeout do a float64 multiply per frame through fx)
+                                local_t = t - idx * video_duration
+                                alpha = int(256 * min(1.0, local_t / fade, (video_duration - local_t) / fade))
+                                if alpha >= 256:
+                                    return frame
+                                return (frame.astype(np.uint16) * max(alpha, 0) >> 8).astype(np.uint8)
+
+                            final_video = mp.VideoClip(make_frame, duration=video_duration * len(frames))
+
+                            st.info("💾 Rendering video (this may take a minute)...")
+                            partial_path = video_path.replace(".mp4", ".part.mp4")
+                            try:
+                                # Slides have no audio; a fast preset on all cores keeps the
+                                # encode from dominating video mode
+                                final_video.write_videofile(
+                                    partial_path,
+                                    fps=30,
+                                    codec='libx264',
+                                    audio=False,
+                                    preset='veryfast',
+                                    threads=os.cpu_count(),
+                                    ffmpeg_params=['-crf', '23', '-pix_fmt', 'yuv420p'],
+                                    logger=None
+                                )
+                                # Rename into place only once complete, so a failed render is never reused
+                                os.replace(partial_path, video_path)
+                                evict_cache_dir(VIDEO_CACHE_DIR, VIDEO_CACHE_MAX_FILES, VIDEO_CACHE_TTL_SECONDS)
+                            finally:
+                                # A failed encode leaves a partial file behind; don't let them pile up
+                                if os.path.exists(partial_path):
+                                    os.unlink(partial_path)
 
                         st.success(f"✅ Video generated successfully!")
                         st.video(video_path)
 
-                        # Download button
-                        with open(video_path, "rb") as f:
+                        # Download button - newer Streamlit accepts a callable and only
+                        # reads the mp4 when the button is clicked; older versions need
+                        # the data up front, so hand them the open file
+                        try:
                             st.download_button(
                                 "⬇️ Download Video",
-                                data=f.read(),
+                                data=Path(video_path).read_bytes,
                                 file_name=video_filename,
                                 mime="video/mp4",
                                 use_container_width=True
                             )
+                        except StreamlitAPIException:
+                            with open(video_path, "rb") as f:
+                                st.download_button(
+                                    "⬇️ Download Video",
+                                    data=f,
+                                    file_name=video_filename,
+                                    mime="video/mp4",
+                                    use_container_width=True
+                                )
 
                     except Exception as e:
-                        st.error(f"❌ Video generation error: {str(e)}")
-                        import traceback
-                        st.code(traceback.format_exc())
+                        _report_error("Video generation error", e)
 
             # Image generation mode
             elif not api_key:
@@ -1218,17 +1684,20 @@ High quality, professional, 8K resolution, crystal clear details.
 
                     # Priority: Collection Infusion > Regular Upload > Fetched
                     if is_collection_infusion:
-                        # Use collection infusion images
-                        for img_file in st.session_state.collection_infusion_imgs:
-                            img = safe_open_image(img_file)
-                            images_to_process.append(img)
-                        st.success(f"✅ Loaded {len(images_to_process)} images for collection infusion")
+                        # Enhanced mode composites straight from the upload bytes; only
+                        # basic mode needs them decoded here
+                        if not enhanced_available:
+                            for img_file in st.session_state.collection_infusion_imgs:
+                                img = _decode_upload(img_file.getvalue())
+                                images_to_process.append(img)
+                        st.success(f"✅ Loaded {len(st.session_state.collection_infusion_imgs)} images for collection infusion")
                     elif product_images:
                         for img_file in product_images:
-                            img = safe_open_image(img_file)
                             # Enhance if single image
                             if len(product_images) == 1:
-                                img = enhance_product_image(img)
+                                img = _enhanced_upload(img_file.getvalue())
+                            else:
+                                img = _decode_upload(img_file.getvalue())
                             images_to_process.append(img)
 
                     if 'fetched_product_image' in st.session_state and not is_collection_infusion:
@@ -1241,33 +1710,35 @@ High quality, professional, 8K resolution, crystal clear details.
 
                     # Handle Collection Infusion Mode (takes priority)
                     if is_collection_infusion and enhanced_available:
-                        st.info(f"🎨 Collection Infusion: Processing {len(images_to_process)} images...")
+                        infusion_uploads = tuple(f.getvalue() for f in st.session_state.collection_infusion_imgs)
+                        blend_uploads = infusion_uploads[:10]  # Auto-Blend / default grid share this composite
+                        st.info(f"🎨 Collection Infusion: Processing {len(infusion_uploads)} images...")
 
                         # Get collection infusion layout mode
                         infusion_layout = st.session_state.get('collection_infusion_mode', '🧩 AI Auto-Blend')
 
                         if "AI Auto-Blend" in infusion_layout:
                             # For AI Auto-Blend, combine images in a grid and let AI reimagine them creatively
-                            combined = combine_multiple_images_layout(images_to_process[:10], "grid")
+                            combined = _combine_uploads(blend_uploads, "grid")
                             images_for_api = [combined]
-                            st.success(f"✅ Combined {len(images_to_process)} images for AI auto-blending")
+                            st.success(f"✅ Combined {len(infusion_uploads)} images for AI auto-blending")
                         elif "Grid" in infusion_layout:
-                            combined = combine_multiple_images_layout(images_to_process, "grid")
+                            combined = _combine_uploads(infusion_uploads, "grid")
                             images_for_api = [combined]
-                            st.success(f"✅ Combined {len(images_to_process)} images in grid layout")
+                            st.success(f"✅ Combined {len(infusion_uploads)} images in grid layout")
                         elif "Horizontal" in infusion_layout:
-                            combined = combine_multiple_images_layout(images_to_process, "horizontal")
+                            combined = _combine_uploads(infusion_uploads, "horizontal")
                             images_for_api = [combined]
-                            st.success(f"✅ Combined {len(images_to_process)} images horizontally")
+                            st.success(f"✅ Combined {len(infusion_uploads)} images horizontally")
                         elif "Vertical" in infusion_layout:
-                            combined = combine_multiple_images_layout(images_to_process, "vertical")
+                            combined = _combine_uploads(infusion_uploads, "vertical")
                             images_for_api = [combined]
-                            st.success(f"✅ Combined {len(images_to_process)} images vertically")
+                            st.success(f"✅ Combined {len(infusion_uploads)} images vertically")
                         else:
                             # Default to grid layout
-                            combined = combine_multiple_images_layout(images_to_process[:10], "grid")
+                            combined = _combine_uploads(blend_uploads, "grid")
                             images_for_api = [combined]
-                            st.success(f"✅ Combined {len(images_to_process)} images for infusion")
+                            st.success(f"✅ Combined {len(infusion_uploads)} images for infusion")
 
                     # Handle Regular Collection Ad Mode
                     elif is_collection_mode and enhanced_available:
@@ -1276,11 +1747,18 @@ High quality, professional, 8K resolution, crystal clear details.
                         # Combine images based on layout
                         image_layout = st.session_state.get('image_layout', "Grid (Auto-arrange)")
                         if "Grid" in image_layout:
-                            combined = combine_multiple_images_layout(images_to_process, "grid")
+                            layout = "grid"
                         elif "Horizontal" in image_layout:
-                            combined = combine_multiple_images_layout(images_to_process, "horizontal")
+                            layout = "horizontal"
                         else:  # Vertical
-                            combined = combine_multiple_images_layout(images_to_process, "vertical")
+                            layout = "vertical"
+
+                        # Reuse the composite across repeated generations with the same inputs
+                        combined = _combine_uploads(
+                            tuple(f.getvalue() for f in product_images),
+                            layout,
+                            tuple(images_to_process[len(product_images):])  # fetched image, if any
+                        )
 
                         images_for_api = [combined]
                         st.success(f"✅ Combined {len(images_to_process)} products into one collection image")
@@ -1295,7 +1773,8 @@ High quality, professional, 8K resolution, crystal clear details.
                         images_for_api = images_to_process[:14]
 
                     # Generate for each size
-                    st.session_state.results = []
+                    st.session_state.results = {}
+                    st.session_state.active_ids = set()
 
                     aspect_map = {
                         "Square (1:1)": ("1:1", (1080, 1080)),
@@ -1303,6 +1782,19 @@ High quality, professional, 8K resolution, crystal clear details.
                         "Landscape (16:9)": ("16:9", (1920, 1080))
                     }
 
+                    # One job per (product x) size; both modes share the pipeline below
+                    jobs = []
+
+                    # Shared by every result's name and cache metadata
+                    brand_name_clean = brand_data['brand_identity'].get('brand_name', 'Product').replace(' ', '_') if brand_data else 'Ad'
+                    ad_metadata_base = {
+                        'brand_name': brand_name_clean,
+                        'style': selected_style,
+                        'concept': selected_concept if enhanced_available else 'N/A',
+                        'negative_prompt': negative_prompt,
+                        'model': selected_model
+                    }
+
                     # Batch Mode: Generate separate ads for each product
                     if is_batch_mode and 'product_details' in st.session_state:
                         st.info(f"📦 Batch Mode: Generating ads for {len(st.session_state.product_details)} products...")
@@ -1320,240 +1812,180 @@ High quality, professional, 8K resolution, crystal clear details.
                             custom_prompt = final_prompt + product_specific_text
 
                             # Load product image
-                            prod_img = safe_open_image(prod_data['file'])
-                            prod_img = enhance_product_image(prod_img)
+                            prod_img = _enhanced_upload(prod_data['file'].getvalue())
 
-                            st.markdown(f"#### 🔄 Generating for: **{prod_name or f'Product {prod_idx+1}'}**")
+                            prod_name_clean = prod_name.replace(' ', '_') if prod_name else f'Product{prod_idx+1}'
+                            name_prefix = f"{brand_name_clean}_{prod_name_clean}"
 
                             for size_name in output_sizes:
-                                aspect_ratio, dimensions = aspect_map[size_name]
-
-                                st.markdown(f"📱 {size_name}...")
-                                progress_placeholder = st.empty()
-
-                                # Generate using API
-                                generated = generate_ad_with_replicate(
-                                    prompt=custom_prompt,
-                                    negative_prompt=negative_prompt,
-                                    api_key=api_key,
-                                    model_key=selected_model,
-                                    aspect_ratio=aspect_ratio,
-                                    product_image=prod_img,
-                                    logo_image=None,
-                                    progress_placeholder=progress_placeholder
-                                )
-
-                                if generated:
-                                    # Resize to exact dimensions
-                                    final_img = generated.resize(dimensions, Image.Resampling.LANCZOS)
-
-                                    # Add logos
-                                    if logo_configs and enhanced_available:
-                                        for logo_config in logo_configs:
-                                            final_img = add_logo_with_smart_positioning(
-                                                final_img,
-                                                logo_config["image"],
-                                                position=logo_config["position"],
-                                                size_percent=logo_config["size_percent"],
-                                                custom_x=logo_config.get("custom_x"),
-                                                custom_y=logo_config.get("custom_y"),
-                                                custom_x_from_right=logo_config.get("custom_x_from_right"),
-                                                remove_bg=logo_config["remove_bg"]
-                                            )
-
-                                    # Don't show preview here - will show in download section
-                                    st.success(f"✅ {prod_name} - {size_name} generated successfully!")
-
-                                    # Save to results
-                                    import io
-                                    buf = io.BytesIO()
-                                    final_img.save(buf, format="PNG", quality=95)
-
-                                    brand_name_clean = st.session_state.brand_data['brand_identity'].get('brand_name', 'Product').replace(' ', '_') if st.session_state.brand_data else 'Ad'
-                                    prod_name_clean = prod_name.replace(' ', '_') if prod_name else f'Product{prod_idx+1}'
-
-                                    st.session_state.results.append({
-                                        "img": final_img,
-                                        "bytes": buf.getvalue(),
-                                        "name": f"{brand_name_clean}_{prod_name_clean}_{size_name.replace(' ', '_').replace('(', '').replace(')', '')}",
-                                        "size": f"{dimensions[0]}x{dimensions[1]}"
-                                    })
-
-                                    # Cache the ad
-                                    ad_metadata = {
-                                        'brand_name': brand_name_clean,
-                                        'product_name': prod_name,
-                                        'size': f"{dimensions[0]}x{dimensions[1]}",
-                                        'size_name': size_name,
-                                        'style': selected_style if enhanced_available else selected_style,
-                                        'concept': selected_concept if enhanced_available else 'N/A',
-                                        'prompt': custom_prompt,
-                                        'negative_prompt': negative_prompt,
-                                        'model': selected_model,
-                                        'aspect_ratio': aspect_ratio
-                                    }
-                                    save_ad_to_cache(
-                                        ad_name=f"{brand_name_clean}_{prod_name_clean}_{size_name.replace(' ', '_')}",
-                                        ad_data=ad_metadata,
-                                        image=final_img
-                                    )
-
-                                    progress_placeholder.empty()
-                                else:
-                                    st.warning(f"⚠️ {size_name} generation failed")
-                                    progress_placeholder.empty()
-
-                            st.markdown("---")
+                                size_slug = size_name.translate(SIZE_SLUG_TABLE)
+                                jobs.append({
+                                    "label": f"{prod_name} - {size_name}",
+                                    "prompt": custom_prompt,
+                                    "product_image": prod_img,
+                                    "size_name": size_name,
+                                    "name": f"{name_prefix}_{size_slug}",
+                                    "ad_name": f"{name_prefix}_{size_slug}",
+                                    "metadata": {'product_name': prod_name, 'prompt': custom_prompt},
+                                    "similarity_scope": (brand_name_clean, prod_name, selected_style, selected_concept)
+                                })
 
                     # Normal Mode: Single generation (collection or single image)
                     else:
+                        product_image = images_for_api[0] if len(images_for_api) == 1 else None
+                        # Products identified by their pixels - normal mode has no name field
+                        product_key = tuple(_image_digest(img) for img in images_for_api)
                         for size_name in output_sizes:
-                            aspect_ratio, dimensions = aspect_map[size_name]
-
-                            st.markdown(f"### 📱 Generating {size_name}...")
-                            progress_placeholder = st.empty()
+                            size_slug = size_name.translate(SIZE_SLUG_TABLE)
+                            jobs.append({
+                                "label": size_name,
+                                "prompt": final_prompt,
+                                "product_image": product_image,
+                                "size_name": size_name,
+                                "name": f"{brand_name_clean}-{size_slug}",
+                                "ad_name": f"{brand_name_clean}_{size_slug}",
+                                "metadata": {'prompt': final_prompt},
+                                "similarity_scope": (brand_name_clean, product_key, selected_style, selected_concept)
+                            })
 
-                            # Generate using API
-                            generated = generate_ad_with_replicate(
-                                prompt=final_prompt,
+                    # Every job is an independent API call, so submit them all at once:
+                    # total time is roughly the slowest generation rather than the sum.
+                    # Streamlit calls stay on this thread as results come back
+                    job_progress = st.progress(0.0, f"🔄 Generating {len(jobs)} ad(s)...")
+                    job_results = {}
+                    failed_labels = []  # Reported once after the loop, not per ad
+                    cache_hits = 0
+
+                    with ThreadPoolExecutor(max_workers=BATCH_GENERATION_WORKERS) as pool:
+                        futures = {}
+                        for job_idx, job in enumerate(jobs):
+                            common = dict(
+                                prompt=job["prompt"],
                                 negative_prompt=negative_prompt,  # ✅ NOW USING EDITABLE NEGATIVE PROMPT!
                                 api_key=api_key,
                                 model_key=selected_model,
-                                aspect_ratio=aspect_ratio,
-                                product_image=images_for_api[0] if len(images_for_api) == 1 else None,
-                                logo_image=None,  # Logos added after generation
-                                progress_placeholder=progress_placeholder
+                                aspect_ratio=aspect_map[job["size_name"]][0],
+                                mode="preview" if preview_mode else "final"
                             )
-    
-                        if generated:
-                            # Resize to exact dimensions
-                            final_img = generated.resize(dimensions, Image.Resampling.LANCZOS)
-    
-                            # Add all logos with proper positioning
-                            if logo_configs and enhanced_available:
-                                st.info(f"🏷️ Adding {len(logo_configs)} logo(s)...")
-
-                                for logo_config in logo_configs:
-                                    final_img = add_logo_with_smart_positioning(
-                                        final_img,
-                                        logo_config["image"],
-                                        position=logo_config["position"],
-                                        size_percent=logo_config["size_percent"],
-                                        custom_x=logo_config.get("custom_x"),
-                                        custom_y=logo_config.get("custom_y"),
-                                        custom_x_from_right=logo_config.get("custom_x_from_right"),
-                                        remove_bg=logo_config["remove_bg"]
-                                    )
-
-                            # Don't show preview here - will show in download section
-                            st.success(f"✅ {size_name} generated successfully!")
-
-                            # Save to results
-                            import io
-                            buf = io.BytesIO()
-                            final_img.save(buf, format="PNG", quality=95)
-    
-                            brand_name_clean = st.session_state.brand_data['brand_identity'].get('brand_name', 'Product').replace(' ', '_') if st.session_state.brand_data else 'Ad'
-    
-                            st.session_state.results.append({
-                                "img": final_img,
-                                "bytes": buf.getvalue(),
-                                "name": f"{brand_name_clean}-{size_name.replace(' ', '_').replace('(', '').replace(')', '')}",
-                                "size": f"{dimensions[0]}x{dimensions[1]}"
-                            })
-
-                            # Cache the generated ad
-                            ad_metadata = {
-                                'brand_name': brand_name_clean,
-                                'size': f"{dimensions[0]}x{dimensions[1]}",
-                                'size_name': size_name,
-                                'style': selected_style if enhanced_available else selected_style,
-                                'concept': selected_concept if enhanced_available else 'N/A',
-                                'prompt': final_prompt,
-                                'negative_prompt': negative_prompt,
-                                'model': selected_model,
-                                'aspect_ratio': aspect_ratio
-                            }
-                            save_ad_to_cache(
-                                ad_name=f"{brand_name_clean}_{size_name.replace(' ', '_')}",
-                                ad_data=ad_metadata,
-                                image=final_img
+                            if num_variants > 1:
+                                future = pool.submit(generate_ad_variants, num_variants=num_variants, **common)
+                            else:
+                                future = pool.submit(
+                                    generate_ad_with_replicate,
+                                    product_image=job["product_image"],
+                                    logo_image=None,  # Logos added after generation
+                                    use_cache=reuse_cached,
+                                    reuse_similar=reuse_similar,
+                                    similarity_scope=job["similarity_scope"],
+                                    **common
+                                )
+                            futures[future] = job_idx
+
+                        for done_count, future in enumerate(as_completed(futures), 1):
+                            job_idx = futures[future]
+                            job = jobs[job_idx]
+                            generated = future.result()
+                            # Variants come back as a list; a single generation as an image or None
+                            images = generated if num_variants > 1 else [generated] if generated else []
+
+                            job_progress.progress(
+                                done_count / len(jobs),
+                                f"🔄 {done_count}/{len(jobs)} ads finished - {'✅' if images else '⚠️'} {job['label']}"
                             )
 
-                            progress_placeholder.empty()
-                        else:
-                            st.warning(f"⚠️ {size_name} generation failed - see error above")
-                            progress_placeholder.empty()
+                            aspect_ratio, dimensions = aspect_map[job["size_name"]]
+                            job_results[job_idx] = []
+                            for variant_idx, generated in enumerate(images, 1):
+                                cache_hits += bool(generated.info.get("from_cache"))
+                                suffix = f"_v{variant_idx}" if num_variants > 1 else ""
+                                job_results[job_idx].append(_finish_ad(
+                                    generated,
+                                    dimensions,
+                                    logo_configs if enhanced_available else [],
+                                    result_format,
+                                    name=job["name"] + suffix,
+                                    ad_name=job["ad_name"] + suffix,
+                                    ad_metadata={
+                                        **ad_metadata_base,
+                                        **job["metadata"],
+                                        'size_name': job["size_name"],
+                                        'aspect_ratio': aspect_ratio
+                                    }
+                                ))
+                            if len(images) < num_variants:
+                                failed_labels.append(job["label"])
+
+                    # Keep results in job order regardless of completion order
+                    finished = [result for i in sorted(job_results) for result in job_results[i]]
+                    _store_results(finished)
+                    job_progress.empty()
+                    st.success(f"✅ {len(finished)}/{len(jobs) * num_variants} ads generated")
+                    if cache_hits:
+                        st.info(f"💾 {cache_hits} of these reused an identical earlier generation - untick 'Reuse identical results' for fresh variations")
+                    if failed_labels:
+                        st.warning(f"⚠️ Generation failed for: {', '.join(failed_labels)}")
     
                     if st.session_state.results:
                         st.balloons()
                         # Success message shown in download section
     
                 except Exception as e:
-                    st.error(f"❌ Error during generation: {str(e)}")
-                    import traceback
-                    st.code(traceback.format_exc())
+                    _report_error("Error during generation", e)
     
         # ========== DOWNLOAD SECTION ==========
         if st.session_state.results:
-            # Initialize removed ads tracker
-            if 'removed_ads' not in st.session_state:
-                st.session_state.removed_ads = set()
-
             st.markdown("---")
             st.markdown("## 📥 Your Generated Ads")
 
-            # Count remaining ads
-            remaining_count = len([r for idx, r in enumerate(st.session_state.results) if idx not in st.session_state.removed_ads])
-            st.info(f"✨ {remaining_count} ad(s) ready. Remove unwanted ads before uploading to Drive.")
+            active_ids = sorted(st.session_state.active_ids)
+            st.info(f"✨ {len(active_ids)} ad(s) ready. Remove unwanted ads before uploading to Drive.")
 
-            cols = st.columns(min(len(st.session_state.results), 3))
-            for idx, result in enumerate(st.session_state.results):
-                # Skip removed ads
-                if idx in st.session_state.removed_ads:
-                    continue
+            cols = st.columns(min(len(active_ids), 3) or 1)
+            for pos, idx in enumerate(active_ids):
+                result = st.session_state.results[idx]
 
-                with cols[idx % 3]:
-                    st.image(result["img"], use_column_width=True, caption=f"✅ {result['size']}")
+                with cols[pos % 3]:
+                    # Small stored JPEG; the full-size bytes are only sent on download
+                    st.image(result["thumb_bytes"], use_column_width=True, caption=f"✅ {result['size']}")
 
                     col_btn1, col_btn2 = st.columns(2)
                     with col_btn1:
                         st.download_button(
                             "⬇️ Download",
                             result["bytes"],
-                            f"{result['name']}.png",
-                            "image/png",
+                            f"{result['name']}.{result['ext']}",
+                            result["mime"],
                             key=f"dl_enhanced_{idx}",
                             use_container_width=True,
                             help=f"Download {result['name']}"
                         )
                     with col_btn2:
                         if st.button("🗑️ Remove", key=f"remove_ad_{idx}", use_container_width=True, help="Remove from upload list"):
-                            st.session_state.removed_ads.add(idx)
-                            st.rerun()
+                            st.session_state.active_ids.discard(idx)
+                            st.session_state._dirty = True
 
             # Bulk download option
             if len(st.session_state.results) > 1:
                 st.markdown("#### 📦 Bulk Download")
                 if st.button("📦 Download All as ZIP", key="bulk_download"):
-                    import zipfile
-                    zip_buffer = io.BytesIO()
-    
-                    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
-                        for result in st.session_state.results:
-                            zip_file.writestr(
-                                f"{result['name']}.png",
-                                result["bytes"]
-                            )
-    
-                    zip_buffer.seek(0)
-                    st.download_button(
-                        "⬇️ Download ZIP File",
-                        zip_buffer.getvalue(),
-                        "generated_ads.zip",
-                        "application/zip",
-                        key="zip_download"
-                    )
+                    # Build the archive on disk so only the finished ZIP is read back into memory
+                    with tempfile.TemporaryFile(suffix=".zip") as zip_tmp:
+                        # Images are already compressed; deflating them again only burns CPU
+                        with zipfile.ZipFile(zip_tmp, "w", zipfile.ZIP_STORED, allowZip64=True) as zip_file:
+                            for result in st.session_state.results.values():
+                                zip_file.writestr(
+                                    f"{result['name']}.{result['ext']}",
+                                    result["bytes"]
+                                )
+                        zip_tmp.seek(0)
+
+                        st.download_button(
+                            "⬇️ Download ZIP File",
+                            zip_tmp.read(),
+                            "generated_ads.zip",
+                            "application/zip",
+                            key="zip_download"
+                        )
     
     # ==================== END TAB2_REPLACEMENT ====================
     
@@ -1561,7 +1993,8 @@ High quality, professional, 8K resolution, crystal clear details.
         # TAB 3: BRAND PROFILE
         # ════════════════════════════════════════════════════════════
     
-    with tab3:
+    @_fragment
+    def _tab_brand_profile():
         st.subheader("📊 Brand Profile")
 
         if not st.session_state.brand_data:
@@ -1648,6 +2081,9 @@ High quality, professional, 8K resolution, crystal clear details.
             # Logos
             with st.expander("Brand Logos"):
                 logos = data.get('1_brand_logo', {})
+                # Both logos in parallel over pooled connections, cached across reruns
+                logo_urls = tuple(logos[k] for k in ('light_logo', 'dark_logo') if logos.get(k))
+                logo_bytes = dict(zip(logo_urls, _fetch_bytes_cached(logo_urls)))
                 col1, col2 = st.columns(2)
                 with col1:
                     if logos.get('light_logo'):
@@ -1655,18 +2091,14 @@ High quality, professional, 8K resolution, crystal clear details.
                         try:
                             st.image(logos['light_logo'], width=200)
                             # Download button for light logo
-                            try:
-                                logo_response = requests.get(logos['light_logo'], timeout=10)
-                                if logo_response.status_code == 200:
-                                    st.download_button(
-                                        "⬇️ Download Light Logo",
-                                        data=logo_response.content,
-                                        file_name="light_logo.png",
-                                        mime="image/png",
-                                        key="download_light_logo"
-                                    )
-                            except:
-                                pass
+                            if logo_bytes.get(logos['light_logo']):
+                                st.download_button(
+                                    "⬇️ Download Light Logo",
+                                    data=logo_bytes[logos['light_logo']],
+                                    file_name="light_logo.png",
+                                    mime="image/png",
+                                    key="download_light_logo"
+                                )
                         except:
                             st.write(logos['light_logo'])
                 with col2:
@@ -1675,18 +2107,14 @@ High quality, professional, 8K resolution, crystal clear details.
                         try:
                             st.image(logos['dark_logo'], width=200)
                             # Download button for dark logo
-                            try:
-                                logo_response = requests.get(logos['dark_logo'], timeout=10)
-                                if logo_response.status_code == 200:
-                                    st.download_button(
-                                        "⬇️ Download Dark Logo",
-                                        data=logo_response.content,
-                                        file_name="dark_logo.png",
-                                        mime="image/png",
-                                        key="download_dark_logo"
-                                    )
-                            except:
-                                pass
+                            if logo_bytes.get(logos['dark_logo']):
+                                st.download_button(
+                                    "⬇️ Download Dark Logo",
+                                    data=logo_bytes[logos['dark_logo']],
+                                    file_name="dark_logo.png",
+                                    mime="image/png",
+                                    key="download_dark_logo"
+                                )
                         except:
                             st.write(logos['dark_logo'])
 
@@ -1780,11 +2208,15 @@ High quality, professional, 8K resolution, crystal clear details.
                 use_container_width=True
             )
 
+    with tab3:
+        _tab_brand_profile()
+
     # ════════════════════════════════════════════════════════════
     # TAB 4: AUTO-SYNC (GOOGLE DRIVE & EXCEL INTEGRATION)
     # ════════════════════════════════════════════════════════════
 
-    with tab4:
+    @_fragment
+    def _tab_auto_sync():
         st.subheader("🔄 Auto-Sync with Google Drive & Excel")
         st.markdown("### Upload & Auto-Update from Google Drive / Excel")
 
@@ -1869,13 +2301,23 @@ High quality, professional, 8K resolution, crystal clear details.
 
         if credentials_file:
             st.success("✅ Credentials uploaded successfully! This file enables BOTH Drive and Sheets access.")
-            # Save to local
-            with open("credentials.json", "wb") as f:
-                f.write(credentials_file.read())
+            # Save to local once per distinct upload, not on every rerun
+            creds_data = credentials_file.getvalue()
+            creds_key = _content_key(creds_data)
+            if st.session_state.get('_creds_key') != creds_key:
+                with open("credentials.json", "wb") as f:
+                    f.write(creds_data)
+                st.session_state._creds_key = creds_key
+                st.session_state._creds_present = True
 
             st.caption("✓ Google Drive API - Ready")
             st.caption("✓ Google Sheets API - Ready")
 
+        # Probed once per session; the upload above sets it when it writes the file
+        creds_present = st.session_state.get('_creds_present')
+        if creds_present is None:
+            creds_present = st.session_state._creds_present = os.path.exists("credentials.json")
+
         # Drive Configuration
         st.markdown("---")
         st.markdown("#### 2️⃣ Google Drive Configuration")
@@ -1912,8 +2354,7 @@ High quality, professional, 8K resolution, crystal clear details.
 
         if sheet_url:
             # Extract sheet ID
-            import re
-            match = re.search(r'/spreadsheets/d/([a-zA-Z0-9-_]+)', sheet_url)
+            match = SHEET_ID_PATTERN.search(sheet_url)
             if match:
                 sheet_id = match.group(1)
                 st.success(f"✅ Sheet ID extracted: `{sheet_id}`")
@@ -1936,10 +2377,15 @@ High quality, professional, 8K resolution, crystal clear details.
                     """)
 
                 # Get worksheet names and allow selection
-                if os.path.exists("credentials.json"):
-                    from google_sync import get_worksheet_names
+                if creds_present:
+                    # Tabs and headers are cached for 5 minutes; this forces a refetch
+                    if st.button("🔄 Refresh columns", key="refresh_sheet_columns"):
+                        _cached_sheet_layout.clear()
 
-                    worksheet_names, ws_error = get_worksheet_names(sheet_url)
+                    try:
+                        worksheet_names, ws_error = list(_cached_sheet_layout(sheet_url)), None
+                    except RuntimeError as e:
+                        worksheet_names, ws_error = None, str(e)
                     if worksheet_names:
                         selected_worksheet = st.selectbox(
                             "📋 Select Worksheet Tab:",
@@ -1965,11 +2411,12 @@ High quality, professional, 8K resolution, crystal clear details.
             existing_headers = []
             selected_ws = st.session_state.get('selected_worksheet', 'Sheet1')
 
-            if sheet_url and os.path.exists("credentials.json"):
-                from google_sync import get_worksheet_headers
-
+            if sheet_url and creds_present:
                 with st.spinner("📋 Fetching existing columns..."):
-                    existing_headers, header_error = get_worksheet_headers(sheet_url, selected_ws)
+                    try:
+                        existing_headers, header_error = _cached_sheet_layout(sheet_url).get(selected_ws, []), None
+                    except RuntimeError as e:
+                        existing_headers, header_error = None, str(e)
 
                 if header_error:
                     st.warning(f"⚠️ Could not fetch headers: {header_error}")
@@ -1998,6 +2445,7 @@ High quality, professional, 8K resolution, crystal clear details.
                 st.markdown("**Existing Columns from Sheet:**")
 
                 column_selections = {}
+                field_labels = list(data_field_options)
 
                 for idx, header in enumerate(existing_headers):
                     col_check, col_map = st.columns([2, 3])
@@ -2011,23 +2459,17 @@ High quality, professional, 8K resolution, crystal clear details.
 
                     with col_map:
                         # Try to auto-match based on header name
-                        default_match = "-- Don't Use --"
                         header_lower = header.lower()
-                        if "product" in header_lower or "name" in header_lower:
-                            default_match = "Product Name"
-                        elif "size" in header_lower or "dimension" in header_lower:
-                            default_match = "Ad Size"
-                        elif "generate" in header_lower or "date" in header_lower or "time" in header_lower:
-                            default_match = "Generated At"
-                        elif "status" in header_lower:
-                            default_match = "Status"
-                        elif "url" in header_lower or "link" in header_lower or "drive" in header_lower:
-                            default_match = "Ad URL"
+                        default_match = next(
+                            (label for keywords, label in HEADER_AUTO_MATCH
+                             if any(word in header_lower for word in keywords)),
+                            "-- Don't Use --"
+                        )
 
                         mapped_to = st.selectbox(
                             "Maps to:",
-                            options=list(data_field_options.keys()),
-                            index=list(data_field_options.keys()).index(default_match),
+                            options=field_labels,
+                            index=field_labels.index(default_match),
                             key=f"map_header_{idx}",
                             disabled=not use_column
                         )
@@ -2042,65 +2484,17 @@ High quality, professional, 8K resolution, crystal clear details.
 
             new_column_selections = {}
 
-            # Product Name Column
-            col_check1, col_input1, col_map1 = st.columns([1, 2, 2])
-            with col_check1:
-                enable_new_product = st.checkbox("Add", value=not existing_headers, key="enable_new_product")
-            with col_input1:
-                new_col_product = st.text_input("Column Name:", value="Product Name", key="new_col_product", disabled=not enable_new_product)
-            with col_map1:
-                st.selectbox("Maps to:", ["Product Name"], key="map_new_product", disabled=True)
-
-            if enable_new_product:
-                new_column_selections[new_col_product] = "product_name"
-
-            # Ad Size Column
-            col_check2, col_input2, col_map2 = st.columns([1, 2, 2])
-            with col_check2:
-                enable_new_size = st.checkbox("Add", value=not existing_headers, key="enable_new_size")
-            with col_input2:
-                new_col_size = st.text_input("Column Name:", value="Ad Size", key="new_col_size", disabled=not enable_new_size)
-            with col_map2:
-                st.selectbox("Maps to:", ["Ad Size"], key="map_new_size", disabled=True)
-
-            if enable_new_size:
-                new_column_selections[new_col_size] = "size"
-
-            # Generated At Column
-            col_check3, col_input3, col_map3 = st.columns([1, 2, 2])
-            with col_check3:
-                enable_new_generated = st.checkbox("Add", value=not existing_headers, key="enable_new_generated")
-            with col_input3:
-                new_col_generated = st.text_input("Column Name:", value="Generated At", key="new_col_generated", disabled=not enable_new_generated)
-            with col_map3:
-                st.selectbox("Maps to:", ["Generated At"], key="map_new_generated", disabled=True)
-
-            if enable_new_generated:
-                new_column_selections[new_col_generated] = "generated_at"
-
-            # Status Column
-            col_check4, col_input4, col_map4 = st.columns([1, 2, 2])
-            with col_check4:
-                enable_new_status = st.checkbox("Add", value=not existing_headers, key="enable_new_status")
-            with col_input4:
-                new_col_status = st.text_input("Column Name:", value="Status", key="new_col_status", disabled=not enable_new_status)
-            with col_map4:
-                st.selectbox("Maps to:", ["Status"], key="map_new_status", disabled=True)
-
-            if enable_new_status:
-                new_column_selections[new_col_status] = "status"
-
-            # Ad URL Column
-            col_check5, col_input5, col_map5 = st.columns([1, 2, 2])
-            with col_check5:
-                enable_new_url = st.checkbox("Add", value=not existing_headers, key="enable_new_url")
-            with col_input5:
-                new_col_url = st.text_input("Column Name:", value="Ad URL", key="new_col_url", disabled=not enable_new_url)
-            with col_map5:
-                st.selectbox("Maps to:", ["Ad URL"], key="map_new_url", disabled=True)
-
-            if enable_new_url:
-                new_column_selections[new_col_url] = "drive_link"
+            for key, label, field in NEW_COLUMN_SPEC:
+                col_check, col_input, col_map = st.columns([1, 2, 2])
+                with col_check:
+                    enabled = st.checkbox("Add", value=not existing_headers, key=f"enable_new_{key}")
+                with col_input:
+                    column_name = st.text_input("Column Name:", value=label, key=f"new_col_{key}", disabled=not enabled)
+                with col_map:
+                    st.selectbox("Maps to:", [label], key=f"map_new_{key}", disabled=True)
+
+                if enabled:
+                    new_column_selections[column_name] = field
 
             # Merge existing and new column selections
             if existing_headers:
@@ -2130,21 +2524,20 @@ High quality, professional, 8K resolution, crystal clear details.
             if st.button("📤 Upload to Drive", use_container_width=True):
                 if not drive_folder_id:
                     st.error("❌ Please enter a Google Drive folder ID first")
-                elif not os.path.exists("credentials.json"):
+                elif not creds_present:
                     st.error("❌ Please upload credentials.json first")
                 elif not st.session_state.results:
                     st.error("❌ No generated ads to upload. Generate some ads first!")
                 else:
                     # Check if there are any non-removed ads to upload
-                    removed_ads = st.session_state.get('removed_ads', set())
-                    ads_to_upload = [r for idx, r in enumerate(st.session_state.results) if idx not in removed_ads]
+                    active_ids = sorted(st.session_state.active_ids)
 
-                    if not ads_to_upload:
+                    if not active_ids:
                         st.error("❌ No ads selected. All ads have been removed.")
                     else:
+                        temp_files = []
                         try:
                             from google_sync import check_google_libraries, batch_upload_to_drive
-                            import tempfile
 
                             # Check if libraries are installed
                             libs_ok, lib_error = check_google_libraries()
@@ -2152,17 +2545,17 @@ High quality, professional, 8K resolution, crystal clear details.
                                 st.error(f"❌ {lib_error}\n\nInstall with:\n```bash\npip install google-auth-oauthlib google-auth-httplib2 google-api-python-client gspread\n```")
                             else:
                                 # Save results to temporary files (only non-removed ads)
-                                temp_files = []
                                 file_to_result_map = {}  # Map temp file to result info
-                                for idx, result in enumerate(st.session_state.results):
-                                    if idx not in removed_ads:
-                                        temp_file = tempfile.NamedTemporaryFile(suffix=".png", delete=False)
-                                        result['img'].save(temp_file.name, format='PNG')
-                                        temp_files.append(temp_file.name)
-                                        file_to_result_map[temp_file.name] = {
-                                            'index': idx,
-                                            'name': result.get('name', f'Ad_{idx}')
-                                        }
+                                for idx in active_ids:
+                                    result = st.session_state.results[idx]
+                                    # Results already hold their encoded bytes; write them instead of re-encoding
+                                    with tempfile.NamedTemporaryFile(suffix=f".{result['ext']}", delete=False) as temp_file:
+                                        temp_file.write(result['bytes'])
+                                    temp_files.append(temp_file.name)
+                                    file_to_result_map[temp_file.name] = {
+                                        'index': idx,
+                                        'name': result.get('name', f'Ad_{idx}')
+                                    }
 
                                 # Upload with progress
                                 progress_placeholder = st.empty()
@@ -2180,7 +2573,6 @@ High quality, professional, 8K resolution, crystal clear details.
                                 # Add to Google Sheet if Sheet URL is provided
                                 if sheet_url:
                                     from google_sync import append_ads_to_sheet_custom
-                                    from datetime import datetime
 
                                     st.info("📝 Adding ads to Google Sheet...")
 
@@ -2225,21 +2617,21 @@ High quality, professional, 8K resolution, crystal clear details.
                                             for error in append_results['errors']:
                                                 st.error(error)
 
-                                # Clean up temp files
-                                for temp_file in temp_files:
-                                    try:
-                                        os.unlink(temp_file)
-                                    except:
-                                        pass
-
                         except Exception as e:
                             st.error(f"❌ Error: {str(e)}")
+                        finally:
+                            # Clean up temp files, also when the upload or sheet update failed
+                            for temp_file in temp_files:
+                                try:
+                                    os.unlink(temp_file)
+                                except:
+                                    pass
 
         with col2:
             if st.button("🔄 Full Sync", use_container_width=True):
                 if not sheet_url or not drive_folder_id:
                     st.error("❌ Please configure both Sheet URL and Drive folder ID")
-                elif not os.path.exists("credentials.json"):
+                elif not creds_present:
                     st.error("❌ Please upload credentials.json first")
                 else:
                     try:
@@ -2316,6 +2708,14 @@ High quality, professional, 8K resolution, crystal clear details.
         - Version history in Drive
         """)
 
+    with tab4:
+        _tab_auto_sync()
+
+    # Sidebar and Generate Ads actions mark the run dirty instead of calling
+    # st.rerun() inline, so several clicks in one run cost a single rerun
+    if st.session_state.pop('_dirty', False):
+        st.rerun()
+
 
 if __name__ == "__main__":
     main()
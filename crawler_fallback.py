@@ -5,6 +5,7 @@ Version: 2.0 - Fixed logos structure
 """
 
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict
 import streamlit as st
 
@@ -53,14 +54,19 @@ def run_crawl_with_fallback(website_url: str, max_depth: int, max_pages: int, pr
             if progress_bar:
                 progress_bar.progress(0.2)
 
-            # Get brand intelligence
-            brand_intel = enhanced_scrape(website_url)
+            # Brand intelligence and products are independent HTTP fetches - run them together
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                brand_intel_future = pool.submit(enhanced_scrape, website_url)
+                products_future = pool.submit(fetch_products_from_url, website_url)
 
-            if progress_bar:
-                progress_bar.progress(0.4)
+                # Get brand intelligence
+                brand_intel = brand_intel_future.result()
+
+                if progress_bar:
+                    progress_bar.progress(0.4)
 
-            # Get products
-            products, error = fetch_products_from_url(website_url)
+                # Get products
+                products, error = products_future.result()
 
             if progress_bar:
                 progress_bar.progress(0.7)
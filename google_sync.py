@@ -5,10 +5,18 @@ Handles authentication, file uploads, and sheet operations
 
 import os
 import json
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from typing import List, Dict, Optional
 from pathlib import Path
 
+# Spreadsheet ID out of a Google Sheets URL; compiled once for every sheet call
+SHEET_ID_PATTERN = re.compile(r'/spreadsheets/d/([a-zA-Z0-9-_]+)')
+
+# Concurrent Drive uploads in batch_upload_to_drive (each is an independent POST)
+DRIVE_UPLOAD_WORKERS = 8
+
 def check_google_libraries():
     """Check if required Google libraries are installed"""
     try:
@@ -71,19 +79,23 @@ def get_google_credentials():
         return None, f"Authentication error: {str(e)}"
 
 
-def upload_file_to_drive(file_path: str, folder_id: str, file_name: str = None) -> tuple:
+def upload_file_to_drive(file_path: str, folder_id: str, file_name: str = None, creds=None) -> tuple:
     """
     Upload a file to Google Drive
 
+    Args:
+        creds: Credentials from get_google_credentials (fetched here if omitted)
+
     Returns: (file_url, error_message)
     """
     try:
         from googleapiclient.discovery import build
         from googleapiclient.http import MediaFileUpload
 
-        creds, error = get_google_credentials()
-        if error:
-            return None, error
+        if creds is None:
+            creds, error = get_google_credentials()
+            if error:
+                return None, error
 
         service = build('drive', 'v3', credentials=creds)
 
@@ -119,14 +131,13 @@ def read_sheet_data(sheet_url: str, sheet_name: str = 'Sheet1') -> tuple:
     """
     try:
         import gspread
-        import re
 
         creds, error = get_google_credentials()
         if error:
             return None, error
 
         # Extract sheet ID from URL
-        match = re.search(r'/spreadsheets/d/([a-zA-Z0-9-_]+)', sheet_url)
+        match = SHEET_ID_PATTERN.search(sheet_url)
         if not match:
             return None, "Invalid sheet URL format"
 
@@ -160,14 +171,13 @@ def update_sheet_row(sheet_url: str, row_number: int, updates: Dict, sheet_name:
     """
     try:
         import gspread
-        import re
 
         creds, error = get_google_credentials()
         if error:
             return False, error
 
         # Extract sheet ID
-        match = re.search(r'/spreadsheets/d/([a-zA-Z0-9-_]+)', sheet_url)
+        match = SHEET_ID_PATTERN.search(sheet_url)
         if not match:
             return False, "Invalid sheet URL format"
 
@@ -197,23 +207,36 @@ def batch_upload_to_drive(file_paths: List[str], folder_id: str, progress_callba
     """
     Upload multiple files to Google Drive
 
+    Files are uploaded concurrently; progress_callback is called from the
+    calling thread as each one finishes.
+
     Returns: Dict with results {filename: url or error}
     """
     results = {}
     total = len(file_paths)
 
-    for idx, file_path in enumerate(file_paths):
-        file_name = os.path.basename(file_path)
+    # Authenticate once up front rather than racing token refreshes per thread
+    creds, error = get_google_credentials()
+    if error:
+        return {os.path.basename(p): {'status': 'error', 'message': error} for p in file_paths}
 
-        if progress_callback:
-            progress_callback(idx + 1, total, file_name)
+    with ThreadPoolExecutor(max_workers=DRIVE_UPLOAD_WORKERS) as pool:
+        futures = {
+            pool.submit(upload_file_to_drive, file_path, folder_id, os.path.basename(file_path), creds): os.path.basename(file_path)
+            for file_path in file_paths
+        }
 
-        url, error = upload_file_to_drive(file_path, folder_id, file_name)
+        for done_count, future in enumerate(as_completed(futures), 1):
+            file_name = futures[future]
+            url, error = future.result()
 
-        if error:
-            results[file_name] = {'status': 'error', 'message': error}
-        else:
-            results[file_name] = {'status': 'success', 'url': url}
+            if error:
+                results[file_name] = {'status': 'error', 'message': error}
+            else:
+                results[file_name] = {'status': 'success', 'url': url}
+
+            if progress_callback:
+                progress_callback(done_count, total, file_name)
 
     return results
 
@@ -270,14 +293,13 @@ def update_sheet_with_drive_links(sheet_url: str, product_name: str, drive_link:
 
         # Otherwise, find the row by product name
         import gspread
-        import re
 
         creds, error = get_google_credentials()
         if error:
             return False, error
 
         # Extract sheet ID
-        match = re.search(r'/spreadsheets/d/([a-zA-Z0-9-_]+)', sheet_url)
+        match = SHEET_ID_PATTERN.search(sheet_url)
         if not match:
             return False, "Invalid sheet URL format"
 
@@ -355,7 +377,6 @@ def append_ads_to_sheet(sheet_url: str, ads_data: List[Dict], sheet_name: str =
     """
     try:
         import gspread
-        import re
         from datetime import datetime
 
         creds, error = get_google_credentials()
@@ -363,7 +384,7 @@ def append_ads_to_sheet(sheet_url: str, ads_data: List[Dict], sheet_name: str =
             return {'succeeded': 0, 'failed': len(ads_data), 'errors': [error]}
 
         # Extract sheet ID
-        match = re.search(r'/spreadsheets/d/([a-zA-Z0-9-_]+)', sheet_url)
+        match = SHEET_ID_PATTERN.search(sheet_url)
         if not match:
             return {'succeeded': 0, 'failed': len(ads_data), 'errors': ["Invalid sheet URL format"]}
 
@@ -449,14 +470,13 @@ def get_worksheet_names(sheet_url: str) -> tuple:
     """
     try:
         import gspread
-        import re
 
         creds, error = get_google_credentials()
         if error:
             return None, error
 
         # Extract sheet ID
-        match = re.search(r'/spreadsheets/d/([a-zA-Z0-9-_]+)', sheet_url)
+        match = SHEET_ID_PATTERN.search(sheet_url)
         if not match:
             return None, "Invalid sheet URL format"
 
@@ -488,14 +508,13 @@ def get_worksheet_headers(sheet_url: str, sheet_name: str) -> tuple:
     """
     try:
         import gspread
-        import re
 
         creds, error = get_google_credentials()
         if error:
             return None, error
 
         # Extract sheet ID
-        match = re.search(r'/spreadsheets/d/([a-zA-Z0-9-_]+)', sheet_url)
+        match = SHEET_ID_PATTERN.search(sheet_url)
         if not match:
             return None, "Invalid sheet URL format"
 
@@ -520,6 +539,68 @@ def get_worksheet_headers(sheet_url: str, sheet_name: str) -> tuple:
         return None, f"Error getting headers: {str(e)}"
 
 
+def get_worksheets_and_headers(sheet_url: str) -> tuple:
+    """
+    Get every worksheet/tab name with its header row in two small API requests
+
+    Replaces a get_worksheet_names + get_worksheet_headers pair (and a
+    further round of calls whenever a different tab is selected). The first
+    request lists the tab titles, the second reads row 1 of every tab; the
+    Sheets API has no way to address "row 1 of each tab" without the titles.
+
+    Args:
+        sheet_url: Google Sheet URL
+
+    Returns: ({worksheet name: list of header names} in tab order, error_message)
+    """
+    try:
+        from googleapiclient.discovery import build
+
+        creds, error = get_google_credentials()
+        if error:
+            return None, error
+
+        # Extract sheet ID
+        match = SHEET_ID_PATTERN.search(sheet_url)
+        if not match:
+            return None, "Invalid sheet URL format"
+
+        sheet_id = match.group(1)
+
+        # Tab titles only - no grid data, no other properties
+        service = build('sheets', 'v4', credentials=creds)
+        spreadsheet = service.spreadsheets().get(
+            spreadsheetId=sheet_id,
+            fields='sheets/properties/title'
+        ).execute()
+        titles = [sheet['properties']['title'] for sheet in spreadsheet.get('sheets', [])]
+        if not titles:
+            return {}, None
+
+        # First row of every tab, with the response trimmed to titles and cell text
+        metadata = service.spreadsheets().get(
+            spreadsheetId=sheet_id,
+            includeGridData=True,
+            ranges=["'{}'!1:1".format(title.replace("'", "''")) for title in titles],
+            fields='sheets(properties/title,data/rowData/values/formattedValue)'
+        ).execute()
+
+        layout = {}
+        for sheet in metadata.get("sheets", []):
+            row_data = (sheet.get("data") or [{}])[0].get("rowData") or [{}]
+            cells = row_data[0].get("values", [])
+            # Filter out empty headers
+            layout[sheet["properties"]["title"]] = [
+                cell["formattedValue"] for cell in cells
+                if cell.get("formattedValue", "").strip()
+            ]
+
+        return layout, None
+
+    except Exception as e:
+        return None, f"Error getting worksheets: {str(e)}"
+
+
 def append_ads_to_sheet_custom(sheet_url: str, ads_data: List[Dict],
                                 sheet_name: str = 'Sheet1',
                                 column_mapping: Dict = None,
@@ -539,7 +620,6 @@ def append_ads_to_sheet_custom(sheet_url: str, ads_data: List[Dict],
     """
     try:
         import gspread
-        import re
         from datetime import datetime
 
         # Default column mapping if none provided
@@ -561,7 +641,7 @@ def append_ads_to_sheet_custom(sheet_url: str, ads_data: List[Dict],
             return {'succeeded': 0, 'failed': len(ads_data), 'errors': [error]}
 
         # Extract sheet ID
-        match = re.search(r'/spreadsheets/d/([a-zA-Z0-9-_]+)', sheet_url)
+        match = SHEET_ID_PATTERN.search(sheet_url)
         if not match:
             return {'succeeded': 0, 'failed': len(ads_data), 'errors': ["Invalid sheet URL format"]}
 
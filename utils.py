@@ -3,14 +3,21 @@ Utility Functions for Brand Extractor
 Handles: caching, image processing, file operations
 """
 
+import hashlib
 import json
+import os
 import re
+import threading
+import time
 import io
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 from PIL import Image, ImageEnhance, ImageFilter
 import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import streamlit as st
 
 
@@ -24,10 +31,46 @@ CACHE_DIR.mkdir(exist_ok=True)
 AD_CACHE_DIR = Path("ad_cache")
 AD_CACHE_DIR.mkdir(exist_ok=True)
 
+# Raw bytes of downloaded images (logos, brand images), keyed by URL hash
+DOWNLOAD_CACHE_DIR = Path("download_cache")
+DOWNLOAD_CACHE_DIR.mkdir(exist_ok=True)
+DOWNLOAD_CACHE_MAX_FILES = 500
+DOWNLOAD_CACHE_TTL_SECONDS = 7 * 24 * 3600  # Entries unused this long are dropped
+
+# Rendered collection videos, keyed by a hash of their images + settings
+VIDEO_CACHE_DIR = AD_CACHE_DIR / "videos"
+VIDEO_CACHE_DIR.mkdir(exist_ok=True)
+VIDEO_CACHE_MAX_FILES = 20  # Full-size mp4s; keep far fewer than images
+VIDEO_CACHE_TTL_SECONDS = 7 * 24 * 3600
+
+
+def evict_cache_dir(directory: Path, max_files: int, ttl_seconds: int) -> None:
+    """Drop expired files in a cache directory, then least recently used ones past the cap"""
+    try:
+        cached = sorted(directory.iterdir(), key=lambda p: p.stat().st_mtime)
+        cutoff = time.time() - ttl_seconds
+        expired = sum(1 for p in cached if p.stat().st_mtime < cutoff)
+        for old in cached[:max(expired, len(cached) - max_files)]:
+            old.unlink(missing_ok=True)
+    except OSError:
+        pass  # Caching is best-effort; never fail the caller over it
+
+
+def _evict_downloads() -> None:
+    evict_cache_dir(DOWNLOAD_CACHE_DIR, DOWNLOAD_CACHE_MAX_FILES, DOWNLOAD_CACHE_TTL_SECONDS)
+
+
+def brand_cache_path(brand_name: str) -> Path:
+    """Cache file backing a brand name"""
+    return CACHE_DIR / f"{brand_name.lower().replace(' ', '_')}.json"
+
 
 def save_brand_to_cache(brand_name: str, brand_data: Dict) -> bool:
     """Save brand data to cache file"""
-    filename = CACHE_DIR / f"{brand_name.lower().replace(' ', '_')}.json"
+    filename = brand_cache_path(brand_name)
+    # Display form stored once so the sidebar doesn't slice it every rerun
+    if 'extraction_date' in brand_data:
+        brand_data['extraction_date_short'] = str(brand_data['extraction_date'])[:10]
     try:
         with open(filename, 'w', encoding='utf-8') as f:
             json.dump(brand_data, f, indent=2, ensure_ascii=False, default=str)
@@ -38,7 +81,7 @@ def save_brand_to_cache(brand_name: str, brand_data: Dict) -> bool:
 
 def load_brand_from_cache(brand_name: str) -> Optional[Dict]:
     """Load brand data from cache file"""
-    filename = CACHE_DIR / f"{brand_name.lower().replace(' ', '_')}.json"
+    filename = brand_cache_path(brand_name)
     if filename.exists():
         try:
             with open(filename, 'r', encoding='utf-8') as f:
@@ -58,7 +101,7 @@ def list_cached_brands() -> List[str]:
 
 def delete_brand_cache(brand_name: str) -> bool:
     """Delete brand from cache"""
-    filename = CACHE_DIR / f"{brand_name.lower().replace(' ', '_')}.json"
+    filename = brand_cache_path(brand_name)
     if filename.exists():
         filename.unlink()
         return True
@@ -87,12 +130,13 @@ def save_ad_to_cache(ad_name: str, ad_data: Dict, image: Image.Image) -> bool:
 
         # Save image
         img_path = AD_CACHE_DIR / f"{safe_id}.png"
-        image.save(img_path, format='PNG', quality=95)
+        image.save(img_path, format='PNG', compress_level=1)
 
         # Save metadata
         meta_path = AD_CACHE_DIR / f"{safe_id}.json"
         ad_data['cache_id'] = safe_id
         ad_data['cached_at'] = datetime.now().isoformat()
+        ad_data['cached_at_short'] = ad_data['cached_at'][:10]
         with open(meta_path, 'w', encoding='utf-8') as f:
             json.dump(ad_data, f, indent=2, ensure_ascii=False, default=str)
 
@@ -103,6 +147,21 @@ def save_ad_to_cache(ad_name: str, ad_data: Dict, image: Image.Image) -> bool:
         return False
 
 
+# Single writer so cache files land in submission order, off the request thread
+_CACHE_WRITE_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ad-cache-write")
+
+
+def save_ad_to_cache_async(ad_name: str, ad_data: Dict, image: Image.Image) -> Future:
+    """
+    Queue save_ad_to_cache on a background thread
+
+    The image must not be modified afterwards.
+    Returns:
+        Future resolving to save_ad_to_cache's result
+    """
+    return _CACHE_WRITE_POOL.submit(save_ad_to_cache, ad_name, ad_data, image)
+
+
 def load_ad_from_cache(cache_id: str) -> Optional[Dict]:
     """
     Load cached ad with its image and metadata
@@ -142,11 +201,17 @@ def list_cached_ads() -> List[Dict]:
                 metadata = json.load(f)
 
             # Extract key info
+            brand_name = metadata.get('brand_name', 'Unknown')
+            size = metadata.get('size', 'Unknown')
+            cached_at = metadata.get('cached_at', 'Unknown')
+            cached_at_short = metadata.get('cached_at_short') or cached_at[:10]
             cached.append({
                 'cache_id': metadata.get('cache_id', meta_file.stem),
-                'brand_name': metadata.get('brand_name', 'Unknown'),
-                'size': metadata.get('size', 'Unknown'),
-                'cached_at': metadata.get('cached_at', 'Unknown'),
+                'brand_name': brand_name,
+                'size': size,
+                'cached_at': cached_at,
+                'cached_at_short': cached_at_short,
+                'label': f"{brand_name} - {size} ({cached_at_short})",
                 'prompt_preview': metadata.get('prompt', '')[:100] + '...' if metadata.get('prompt') else ''
             })
         except:
@@ -274,6 +339,20 @@ def remove_background(logo_img: Image.Image) -> Image.Image:
     return Image.fromarray(data, 'RGBA')
 
 
+def smart_resize(img: Image.Image, size: tuple) -> Image.Image:
+    """
+    Lanczos resize that pre-shrinks large downscales with a cheap bilinear pass
+
+    Above 3x reduction the image first goes to 1.5x the target bilinearly, so the
+    Lanczos kernel only runs over a small intermediate.
+    """
+    target_width, target_height = size
+    if img.width > 3 * target_width or img.height > 3 * target_height:
+        intermediate = (int(target_width * 1.5), int(target_height * 1.5))
+        img = img.resize(intermediate, Image.Resampling.BILINEAR)
+    return img.resize(size, Image.Resampling.LANCZOS)
+
+
 def enhance_product_image(product_image: Image.Image) -> Image.Image:
     """Enhance product image for better AI generation"""
     img = product_image.copy()
@@ -311,17 +390,25 @@ def enhance_product_image(product_image: Image.Image) -> Image.Image:
     return img
 
 
-def download_image_from_url(image_url: str, base_url: str = "") -> Optional[Image.Image]:
+def download_image_from_url(
+    image_url: str,
+    base_url: str = "",
+    warn: Optional[Callable[[str], None]] = None
+) -> Optional[Image.Image]:
     """
     Download image from URL with error handling and URL cleaning
 
     Args:
         image_url: Full or relative image URL
         base_url: Base URL for resolving relative paths
+        warn: Receives a message for each failure (defaults to st.warning,
+            which only renders on the script thread)
 
     Returns:
         PIL Image or None if failed
     """
+    if warn is None:
+        warn = st.warning
     try:
         # Handle relative URLs
         if base_url and not image_url.startswith(('http://', 'https://', '//')):
@@ -349,21 +436,31 @@ def download_image_from_url(image_url: str, base_url: str = "") -> Optional[Imag
         clean_url = re.sub(r'[&?]width=\{width\}', '', image_url)
         clean_url = re.sub(r'\{width\}', '1200', clean_url)
 
+        # Served from disk if this URL was fetched before
+        cache_file = DOWNLOAD_CACHE_DIR / f"{hashlib.md5(clean_url.encode()).hexdigest()}.bin"
+        if cache_file.exists():
+            try:
+                if time.time() - cache_file.stat().st_mtime > DOWNLOAD_CACHE_TTL_SECONDS:
+                    raise OSError("expired")
+                img = Image.open(cache_file).convert('RGB')
+                os.utime(cache_file)  # Mark as recently used for eviction
+                return img
+            except Exception:
+                cache_file.unlink(missing_ok=True)
+
         headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-        response = requests.get(clean_url, timeout=30, headers=headers)
+        response = _SESSION.get(clean_url, timeout=30, headers=headers)
 
         if response.status_code == 200:
             # Check content type
             content_type = response.headers.get('content-type', '').lower()
             if 'html' in content_type:
-                if st:
-                    st.warning(f"URL returned HTML instead of an image: {clean_url[:100]}")
+                warn(f"URL returned HTML instead of an image: {clean_url[:100]}")
                 return None
 
             # Verify we have content
             if not response.content or len(response.content) < 100:
-                if st:
-                    st.warning(f"URL returned empty or invalid content: {clean_url[:100]}")
+                warn(f"URL returned empty or invalid content: {clean_url[:100]}")
                 return None
 
             # Try to open the image
@@ -386,8 +483,7 @@ def download_image_from_url(image_url: str, base_url: str = "") -> Optional[Imag
                 )
 
                 if not is_likely_image:
-                    if st:
-                        st.warning(f"URL content doesn't appear to be a valid image: {clean_url[:80]}")
+                    warn(f"URL content doesn't appear to be a valid image: {clean_url[:80]}")
                     return None
 
                 img = Image.open(img_buffer)
@@ -395,22 +491,64 @@ def download_image_from_url(image_url: str, base_url: str = "") -> Optional[Imag
 
                 # Re-open after verify (verify closes the file)
                 img_buffer.seek(0)
-                img = Image.open(img_buffer)
-                return img.convert('RGB')
+                img = Image.open(img_buffer).convert('RGB')
+
+                # Keep the verified bytes; write-then-rename so readers never see a partial file
+                partial = cache_file.with_suffix(f".{os.getpid()}.{threading.get_ident()}.part")
+                try:
+                    partial.write_bytes(response.content)
+                    os.replace(partial, cache_file)
+                except OSError:
+                    partial.unlink(missing_ok=True)
+                _evict_downloads()
+                return img
             except Exception as img_error:
-                if st:
-                    st.warning(f"Invalid image format from URL: {clean_url[:80]} - {type(img_error).__name__}")
+                warn(f"Invalid image format from URL: {clean_url[:80]} - {type(img_error).__name__}")
                 return None
         else:
-            if st:
-                st.warning(f"Failed to fetch image (HTTP {response.status_code}): {clean_url[:100]}")
+            warn(f"Failed to fetch image (HTTP {response.status_code}): {clean_url[:100]}")
         return None
     except Exception as e:
-        if st:
-            st.warning(f"Could not load image from URL: {str(e)[:100]}")
+        warn(f"Could not load image from URL: {str(e)[:100]}")
         return None
 
 
+# Pooled connections so repeated downloads from the same CDN skip the TLS handshake
+_SESSION = requests.Session()
+_ADAPTER = HTTPAdapter(pool_connections=8, pool_maxsize=32, max_retries=Retry(total=3, backoff_factor=0.3))
+_SESSION.mount("https://", _ADAPTER)
+_SESSION.mount("http://", _ADAPTER)
+
+
+# Background pool for warming image downloads before the user asks for them
+_PREFETCH_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="image-prefetch")
+
+
+def _prefetch_one(image_url: str, base_url: str) -> Tuple[Optional[Image.Image], Optional[str]]:
+    """Download on a pool thread, handing failures back instead of calling st.warning"""
+    messages = []
+    img = download_image_from_url(image_url, base_url, warn=messages.append)
+    return img, (messages[-1] if messages else None)
+
+
+def prefetch_images(image_urls: List[str], base_url: str = "") -> Dict[str, Future]:
+    """
+    Start downloading several images concurrently in the background
+
+    Args:
+        image_urls: Full or relative image URLs
+        base_url: Base URL for resolving relative paths
+
+    Returns:
+        Dict of URL -> Future resolving to (PIL Image or None, failure message or None);
+        render the message from the script thread
+    """
+    return {
+        url: _PREFETCH_POOL.submit(_prefetch_one, url, base_url)
+        for url in image_urls
+    }
+
+
 def create_collection_collage(
     images: List[Image.Image],
     output_size: tuple = (1080, 1080),
@@ -435,8 +573,8 @@ def create_collection_collage(
     else:
         cols, rows = 3, 3
 
-    # Create blank canvas
-    canvas = Image.new('RGB', output_size, (255, 255, 255))
+    # Create blank canvas (rows x cols x RGB) that tiles are copied into
+    canvas = np.full((output_size[1], output_size[0], 3), 255, dtype=np.uint8)
 
     # Calculate cell size with padding
     padding = 10
@@ -456,10 +594,11 @@ def create_collection_collage(
         x = padding + col * (cell_width + padding) + (cell_width - img_resized.width) // 2
         y = padding + row * (cell_height + padding) + (cell_height - img_resized.height) // 2
 
-        # Paste image
-        canvas.paste(img_resized, (x, y))
+        # Copy image into its cell
+        tile = np.asarray(img_resized.convert('RGB'))
+        canvas[y:y + tile.shape[0], x:x + tile.shape[1]] = tile
 
-    return canvas
+    return Image.fromarray(canvas)
 
 
 def truncate_to_limit(text: str, max_chars: int = 9000) -> str:
@@ -474,3 +613,17 @@ def truncate_to_limit(text: str, max_chars: int = 9000) -> str:
         return truncated[:last_period + 1]
 
     return truncated
+
+
+def fetch_url_bytes(url: str, timeout: int = 10) -> Optional[bytes]:
+    """Raw body of a URL over the pooled session, or None on any failure"""
+    try:
+        response = _SESSION.get(url, timeout=timeout)
+    except requests.RequestException:
+        return None
+    return response.content if response.status_code == 200 else None
+
+
+def fetch_many_bytes(urls: List[str], timeout: int = 10) -> List[Optional[bytes]]:
+    """fetch_url_bytes for several URLs concurrently, in input order"""
+    return list(_PREFETCH_POOL.map(lambda url: fetch_url_bytes(url, timeout), urls))